@@ -1,5 +1,5 @@
 import gradio as gr
-from vector_store_manager import get_pdf_list,add_to_vector_store, clear_all_data
+from vector_store_manager import get_pdf_list,add_to_vector_store, remove_from_vector_store, clear_all_data
 from qa_chain_builder import get_answer
 
 def setup_gradio_ui():
@@ -47,6 +47,12 @@ def setup_gradio_ui():
             outputs=[answer_output,sources_output]
         )
 
+        remove_button.click(
+            remove_from_vector_store,
+            inputs=[pdf_list_dropdown],
+            outputs=[processing_status, pdf_list_dropdown]
+        )
+
         clear_button.click(
             clear_all_data, 
             inputs=[], 
@@ -0,0 +1,15 @@
+"""Shared setup for the benchmarks, import it before any module of the app.
+
+Puts the ask-my-invoice directory on sys.path and, because config.py
+creates its folders relative to the working directory and needs a key to
+import, moves into a fresh temporary directory and sets a placeholder
+GEMINI_API_KEY unless one is already set.
+"""
+import os
+import sys
+import tempfile
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+os.chdir(tempfile.mkdtemp())
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
@@ -0,0 +1,81 @@
+"""Latency and correctness of aggregate questions answered from the metadata index.
+
+get_answer used to sum total_value over the k=5 chunks the self-query
+retriever returned, after an LLM call, so any question matching more than
+five invoices got a wrong count and total. Now the question is compiled to
+a SQL filter over metadata_index.InvoiceIndex. This fills the index with
+--invoices synthetic invoices, answers a set of aggregate questions
+through qa_chain_builder.answer_question and checks every count and total
+against a plain Python scan of the same invoices. No LLM is called.
+
+Run from the ask-my-invoice directory:  python benchmarks/bench_aggregates.py
+"""
+import argparse
+import random
+import time
+
+import _setup
+
+import numpy as np
+
+import qa_chain_builder
+import vector_store_manager
+from metadata_index import parse_date
+
+CUSTOMERS = ["TechNova Solutions", "Acme Corp", "Bluewave Retail", "Greenfield Foods", "Orbit Logistics",
+             "Sunrise Textiles", "Vertex Pharma", "Nimbus Cloud"]
+# question, filter the answer must match
+QUESTIONS = [
+    ("what is the total of all invoices", lambda invoice: True),
+    ("count the invoices for Acme Corp", lambda invoice: invoice["customer_name"] == "Acme Corp"),
+    ("total value invoiced to technova solutions in 2024",
+     lambda invoice: invoice["customer_name"] == "TechNova Solutions" and invoice["date"].startswith("2024")),
+    ("average invoice in March 2025", lambda invoice: invoice["date"].startswith("2025-03")),
+    ("total of invoices between 01-01-2024 and 30-06-2024",
+     lambda invoice: "2024-01-01" <= invoice["date"] <= "2024-06-30"),
+    ("what is the total of invoice INV01234", lambda invoice: invoice["invoice_number"] == "INV01234"),
+    ("count the invoices for 2500 or more", lambda invoice: invoice["total_value"] >= 2500),
+    ("total for Acme Corp above 100000 in 2025", lambda invoice: invoice["customer_name"] == "Acme Corp"
+     and invoice["total_value"] >= 100000 and invoice["date"].startswith("2025")),
+]
+
+
+def make_invoices(count):
+    rng = random.Random(0)
+    invoices = []
+    for number in range(count):
+        invoices.append({"source": f"PDFs/invoice{number}.pdf", "invoice_number": f"INV{number:05d}",
+                         "customer_name": rng.choice(CUSTOMERS),
+                         "invoice_date": f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.choice([2024, 2025])}",
+                         "total_value": round(rng.uniform(500, 250000), 2)})
+        invoices[-1]["date"] = parse_date(invoices[-1]["invoice_date"])
+    return invoices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invoices", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    invoices = make_invoices(args.invoices)
+    vector_store_manager.invoice_index.add_many((invoice["source"], invoice) for invoice in invoices)
+    index = vector_store_manager.invoice_index
+
+    print(f"{args.invoices} invoices in the index")
+    print(f"{'question':58} {'count':>6} {'exact':>6} {'p50 ms':>8}")
+    for question, matches in QUESTIONS:
+        expected = [invoice for invoice in invoices if matches(invoice)]
+        result = index.aggregate(index.parse(question))
+        exact = (result["count"] == len(expected)
+                 and abs(result["total"] - sum(invoice["total_value"] for invoice in expected)) < 0.01)
+        latencies = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            qa_chain_builder.answer_question(question)
+            latencies.append(time.perf_counter() - start)
+        print(f"{question:58} {result['count']:6} {str(exact):>6} {np.percentile(latencies, 50) * 1000:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Per-stage time and LLM calls of get_answer, before and after the answer path changes.
+
+    - rebuilt, retrieving twice: what get_answer used to do, a new
+      SelfQueryRetriever, prompt and RAG chain per question, and a chain
+      that ran the retriever (query constructor LLM call and vector
+      search) again after the retrieval for the sources
+    - rebuilt per question: answer_question with a fresh chain_cache
+    - cached per store: answer_question as it runs in the app
+The LLM is a fake chat model that answers instantly with a fixed
+structured query, and the store is filled with --chunks synthetic invoice
+chunks embedded with a deterministic fake embedding, so the times are the
+local overhead of each stage and no API key is needed. With a real model
+every LLM call adds its round trip on top.
+
+Run from the ask-my-invoice directory:  python benchmarks/bench_answer_path.py
+"""
+import argparse
+import time
+
+import _setup
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnablePassthrough
+
+import llm_utils
+import vector_store_manager
+
+QUESTIONS = ["which invoices were billed to Acme", "what does invoice INV-102 charge for",
+             "who was invoiced in March", "what is the largest invoice"]
+STRUCTURED_QUERY = '```json\n{"query": "invoice", "filter": "NO_FILTER"}\n```'
+
+# qa_chain_builder binds the llm at import, it must be replaced first
+llm_utils.llm = FakeListChatModel(responses=[STRUCTURED_QUERY])
+import qa_chain_builder
+
+
+def fill_store(store, chunks):
+    documents = [Document(page_content=f"Invoice INV-{number} billed to Customer {number % 17} total {number * 10.5}",
+                          metadata={"source": f"invoice{number}.pdf", "invoice_number": f"INV-{number}",
+                                    "total_value": number * 10.5})
+                 for number in range(chunks)]
+    store.add_documents(documents)
+
+
+def answer_retrieving_twice(question):
+    trace = qa_chain_builder.AnswerTrace()
+    retriever = qa_chain_builder.QAChainCache().get(trace)
+    with trace.stage("retriever build"):
+        rag_chain = ({"context": retriever, "question": RunnablePassthrough()}
+                     | qa_chain_builder.QA_PROMPT | qa_chain_builder.llm | StrOutputParser())
+    qa_chain_builder.retrieve(retriever, question, trace)
+    with trace.stage("generation"):
+        rag_chain.invoke(question, config={"callbacks": [trace]})
+    return None, None, trace
+
+
+def answer_rebuilt(question):
+    qa_chain_builder.chain_cache = qa_chain_builder.QAChainCache()
+    return qa_chain_builder.answer_question(question)
+
+
+def run(answer, repeat):
+    timings = {}
+    llm_calls = 0
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            _, _, trace = answer(question)
+            llm_calls += len(trace.llm_calls)
+            for name, seconds in trace.timings.items():
+                timings[name] = timings.get(name, 0.0) + seconds
+    questions = repeat * len(QUESTIONS)
+    return {name: seconds / questions for name, seconds in timings.items()}, llm_calls / questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=25)
+    args = parser.parse_args()
+
+    manager = vector_store_manager.VectorStoreManager(embedding_function=DeterministicFakeEmbedding(size=768))
+    vector_store_manager.store_manager = manager
+    fill_store(manager.get(), args.chunks)
+
+    print(f"{args.chunks} chunks, {args.repeat * len(QUESTIONS)} questions, mean ms per question")
+    for label, answer in (("rebuilt, retrieving twice", answer_retrieving_twice),
+                          ("rebuilt per question", answer_rebuilt),
+                          ("cached per store", qa_chain_builder.answer_question)):
+        start = time.perf_counter()
+        timings, llm_calls = run(answer, args.repeat)
+        total = (time.perf_counter() - start) / (args.repeat * len(QUESTIONS))
+        print(f"\n{label}: {total * 1000:.2f} ms and {llm_calls:.0f} llm calls per question")
+        print(qa_chain_builder.format_timings(timings))
+
+
+if __name__ == "__main__":
+    main()
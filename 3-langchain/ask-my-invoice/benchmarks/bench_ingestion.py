@@ -0,0 +1,81 @@
+"""Embedding calls and time to ingest a batch of invoices, old loop vs upsert_chunks.
+
+The old add_to_vector_store re-split the growing list of pages and called
+add_documents for every file, so N files embedded O(N^2) chunks and stored
+duplicates. Both versions ingest the same --invoices synthetic invoices
+(pages built in memory, so no PDF parsing or metadata LLM call) into a
+fresh collection, with a fake embedding that counts the texts it embeds.
+The new pipeline is then run a second time to show re-adds embed nothing.
+
+Run from the ask-my-invoice directory:  python benchmarks/bench_ingestion.py
+"""
+import argparse
+import time
+
+import _setup
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import vector_store_manager
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    texts: int = 0
+
+    def embed_documents(self, texts):
+        self.texts += len(texts)
+        return super().embed_documents(texts)
+
+
+def invoice_pages(number):
+    lines = "\n".join(f"Item {item}: consulting services for project {number}-{item}, 8 hours at 1250.00 INR"
+                      for item in range(20))
+    source = f"PDFs/invoice{number}.pdf"
+    return [Document(page_content=f"Invoice No: INV-{number}\nBill To: Customer {number}\n{lines}",
+                     metadata={"source": source, "page": 0, "invoice_number": f"INV-{number}"}),
+            Document(page_content=f"Grand Total: {number * 1000 + 0.5}\nThank you for your business.",
+                     metadata={"source": source, "page": 1, "invoice_number": f"INV-{number}"})]
+
+
+def old_ingest(store, files):
+    document = []
+    for pages in files:
+        document.extend(pages)
+        texts = vector_store_manager.text_splitter.split_documents(documents=document)
+        store.add_documents(documents=texts)
+
+
+def new_ingest(store, files):
+    chunks = []
+    for pages in files:
+        chunks.extend(vector_store_manager.text_splitter.split_documents(documents=pages))
+    vector_store_manager.upsert_chunks(store, chunks)
+
+
+def run(label, ingest, files, collection):
+    embedding = CountingEmbedding(size=768)
+    manager = vector_store_manager.VectorStoreManager(collection_name=collection, embedding_function=embedding)
+    for attempt in ("", " (again)") if ingest is new_ingest else ("",):
+        embedding.texts = 0
+        start = time.perf_counter()
+        ingest(manager.get(), files)
+        elapsed = time.perf_counter() - start
+        print(f"{label + attempt:22} {elapsed:8.2f} {embedding.texts:10} {manager.get()._collection.count():8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invoices", type=int, default=100)
+    args = parser.parse_args()
+
+    files = [invoice_pages(number) for number in range(args.invoices)]
+    chunks = sum(len(vector_store_manager.text_splitter.split_documents(pages)) for pages in files)
+    print(f"{args.invoices} invoices, {chunks} distinct chunks")
+    print(f"{'':22} {'seconds':>8} {'embedded':>10} {'stored':>8}")
+    run("old loop", old_ingest, files, "old")
+    run("upsert_chunks", new_ingest, files, "new")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Time to add a batch of invoice PDFs, one file after another vs add_to_vector_store.
+
+Copies the invoices in the repo's PDFs folder until there are --files of
+them and ingests them twice into fresh collections:
+    - sequential: PyPDFLoader and the metadata call per file in turn, the
+      way add_to_vector_store used to work
+    - add_to_vector_store: process pool parsing, metadata calls fanned out
+      under the semaphore and rate limiter, progress streamed per file
+The metadata LLM call is replaced by a fake that sleeps --llm-latency
+seconds, and embeddings by a deterministic fake, so no API key is needed.
+
+Run from the ask-my-invoice directory:  python benchmarks/bench_parallel_ingestion.py
+"""
+import argparse
+import asyncio
+import glob
+import os
+import shutil
+import tempfile
+import time
+from types import SimpleNamespace
+
+import _setup
+
+REPO_PDF_DIR = os.path.join(_setup.APP_DIR, "..", "..", "PDFs")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+import vector_store_manager
+from config import PDF_DIRS
+
+METADATA = {"invoice_date": "01-01-2025", "invoice_number": "INV-1", "total_value": 100.0, "customer_name": "Acme"}
+
+
+def make_uploads(count):
+    sources = sorted(glob.glob(os.path.join(REPO_PDF_DIR, "*.pdf")))
+    upload_dir = tempfile.mkdtemp()
+    uploads = []
+    for number in range(count):
+        path = os.path.join(upload_dir, f"invoice{number:04d}.pdf")
+        shutil.copy(sources[number % len(sources)], path)
+        uploads.append(SimpleNamespace(name=path))
+    return uploads
+
+
+def reset(collection):
+    shutil.rmtree(PDF_DIRS, ignore_errors=True)
+    os.makedirs(PDF_DIRS)
+    vector_store_manager.store_manager = vector_store_manager.VectorStoreManager(
+        collection_name=collection, embedding_function=DeterministicFakeEmbedding(size=768))
+
+
+def sequential(uploads, llm_latency):
+    chunks = []
+    for upload in uploads:
+        pdf_path = os.path.join(PDF_DIRS, os.path.basename(upload.name))
+        shutil.copy(upload.name, pdf_path)
+        doc_pages = vector_store_manager.load_pdf_pages(pdf_path)
+        time.sleep(llm_latency)
+        chunks.extend(vector_store_manager.split_pages(doc_pages, dict(METADATA), pdf_path))
+    vector_store_manager.upsert_chunks(vector_store_manager.store_manager.get(), chunks)
+
+
+async def concurrent(uploads):
+    first_progress = None
+    start = time.perf_counter()
+    async for status, _ in vector_store_manager.add_to_vector_store(uploads):
+        if first_progress is None and "processed" in status:
+            first_progress = time.perf_counter() - start
+    return first_progress, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per fake metadata call")
+    parser.add_argument("--rpm", type=float, default=600, help="metadata requests per minute allowed")
+    args = parser.parse_args()
+
+    async def fake_metadata(doc_content):
+        await asyncio.sleep(args.llm_latency)
+        return dict(METADATA)
+
+    vector_store_manager.extract_metadata_from_document_async = fake_metadata
+    vector_store_manager.metadata_rate_limiter = InMemoryRateLimiter(
+        requests_per_second=args.rpm / 60, check_every_n_seconds=0.01,
+        max_bucket_size=vector_store_manager.METADATA_CONCURRENCY)
+    uploads = make_uploads(args.files)
+    print(f"{args.files} pdfs, {args.llm_latency * 1000:.0f} ms per metadata call, at most {args.rpm:.0f} calls/min, "
+          f"{vector_store_manager.METADATA_CONCURRENCY} at a time, {vector_store_manager.PDF_WORKERS} pdf workers")
+
+    reset("sequential")
+    start = time.perf_counter()
+    sequential(uploads, args.llm_latency)
+    print(f"sequential            {time.perf_counter() - start:7.2f} s")
+
+    reset("concurrent")
+    start = time.perf_counter()
+    first_progress, status = asyncio.run(concurrent(uploads))
+    print(f"add_to_vector_store   {time.perf_counter() - start:7.2f} s  (first file done after {first_progress:.2f} s)")
+    print(status)
+
+
+if __name__ == "__main__":
+    main()
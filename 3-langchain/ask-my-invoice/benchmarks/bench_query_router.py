@@ -0,0 +1,111 @@
+"""LLM calls and latency per question with and without the query router fast path.
+
+Every non-aggregate question used to go through the SelfQueryRetriever,
+one LLM call to turn it into a structured filter before the vector search.
+The query router builds the Chroma where filter itself when a question
+names invoice numbers or customers from the metadata index, or a date
+range. This fills a store and the metadata index with --invoices synthetic
+invoices, answers a mix of questions with the router on and off, and
+checks that every chunk the fast path returns matches the question's
+invoice, customer, dates or amounts. The LLM is a fake chat model that waits
+--llm-latency seconds per call, embeddings are a deterministic fake.
+
+Run from the ask-my-invoice directory:  python benchmarks/bench_query_router.py
+"""
+import argparse
+import random
+import time
+
+import _setup
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
+
+import llm_utils
+import vector_store_manager
+
+STRUCTURED_QUERY = '```json\n{"query": "invoice", "filter": "NO_FILTER"}\n```'
+
+
+class SlowFakeChatModel(FakeListChatModel):
+    latency: float = 0.0
+
+    def _call(self, *args, **kwargs):
+        time.sleep(self.latency)
+        return super()._call(*args, **kwargs)
+
+
+# qa_chain_builder binds the llm at import, it must be replaced first
+llm_utils.llm = SlowFakeChatModel(responses=[STRUCTURED_QUERY])
+import qa_chain_builder
+from metadata_index import parse_date
+
+CUSTOMERS = ["TechNova Solutions", "Acme Corp", "Bluewave Retail", "Greenfield Foods", "Orbit Logistics"]
+# question, test every chunk returned by the fast path must pass (None: the LLM builds the filter)
+QUESTIONS = [
+    ("what did Acme Corp buy", lambda m: m["customer_name"] == "Acme Corp"),
+    ("show me invoice INV00042", lambda m: m["invoice_number"] == "INV00042"),
+    ("which items were billed to bluewave retail in March 2025",
+     lambda m: m["customer_name"] == "Bluewave Retail" and parse_date(m["invoice_date"]).startswith("2025-03")),
+    ("what was invoiced after 15-11-2025", lambda m: parse_date(m["invoice_date"]) >= "2025-11-15"),
+    ("what did Acme Corp buy above 100000", lambda m: m["customer_name"] == "Acme Corp" and m["total_value"] >= 100000),
+    ("what did Acme Corp buy on invoices over 3 pages", None),
+    ("what was billed in March 2030", lambda m: False),
+    ("which invoice has the most laptops", None),
+    ("who is the supplier on these invoices", None),
+]
+
+
+def fill(invoices):
+    rng = random.Random(0)
+    documents = []
+    for number in range(invoices):
+        metadata = {"source": f"PDFs/invoice{number}.pdf", "invoice_number": f"INV{number:05d}",
+                    "customer_name": rng.choice(CUSTOMERS),
+                    "invoice_date": f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.choice([2024, 2025])}",
+                    "total_value": round(rng.uniform(500, 250000), 2)}
+        documents.append(Document(page_content=f"Invoice {metadata['invoice_number']} billed to "
+                                               f"{metadata['customer_name']}: {rng.randint(1, 9)} laptops", metadata=metadata))
+    vector_store_manager.store_manager.get().add_documents(documents)
+    vector_store_manager.invoice_index.add_many((document.metadata["source"], document.metadata)
+                                                for document in documents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invoices", type=int, default=2000)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per fake LLM call")
+    args = parser.parse_args()
+
+    llm_utils.llm.latency = args.llm_latency
+    vector_store_manager.store_manager = vector_store_manager.VectorStoreManager(
+        embedding_function=DeterministicFakeEmbedding(size=768))
+    fill(args.invoices)
+    checker = qa_chain_builder.QueryRouter(vector_store_manager.get_invoice_index)
+
+    print(f"{args.invoices} invoices, {args.llm_latency * 1000:.0f} ms per LLM call")
+    for label, use_router in (("LLM query constructor only", False), ("query router", True)):
+        qa_chain_builder.query_router = qa_chain_builder.QueryRouter(vector_store_manager.get_invoice_index)
+        if not use_router:
+            qa_chain_builder.query_router.route = lambda question: (False, None)
+        llm_calls = 0
+        start = time.perf_counter()
+        for question, _ in QUESTIONS:
+            _, _, trace = qa_chain_builder.answer_question(question)
+            llm_calls += len(trace.llm_calls)
+        elapsed = (time.perf_counter() - start) / len(QUESTIONS)
+        print(f"\n{label}: {elapsed * 1000:.0f} ms and {llm_calls / len(QUESTIONS):.2f} llm calls per question")
+        if use_router:
+            mismatches = 0
+            for question, matches in QUESTIONS:
+                routed, where = checker.route(question)
+                if routed and where:
+                    docs = vector_store_manager.store_manager.get().similarity_search(
+                        question, k=qa_chain_builder.SEARCH_K, filter=where)
+                    mismatches += sum(not matches(doc.metadata) for doc in docs)
+            print(f"router stats: {qa_chain_builder.query_router.stats()}, chunks not matching the filter: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
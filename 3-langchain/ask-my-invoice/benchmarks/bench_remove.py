@@ -0,0 +1,90 @@
+"""Time and embedding calls to remove one invoice, targeted removal vs clear and rebuild.
+
+Before, the only way to drop an invoice was clear_all_data followed by
+adding every other invoice again, which re-embeds the whole knowledge
+base. remove_from_vector_store deletes the chunks of one source from
+Chroma, its row from the metadata index and its file. This fills a store
+with --invoices synthetic invoices (a few chunks each, fake embedding that
+counts the texts it embeds), then removes --remove of them one by one and
+times each call. The rebuild is timed once for comparison.
+
+Run from the ask-my-invoice directory:  python benchmarks/bench_remove.py
+"""
+import argparse
+import os
+import time
+
+import _setup
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import vector_store_manager
+from config import PDF_DIRS
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    texts: int = 0
+
+    def embed_documents(self, texts):
+        self.texts += len(texts)
+        return super().embed_documents(texts)
+
+
+def invoice_chunks(number, chunks_per_invoice):
+    source = os.path.join(PDF_DIRS, f"invoice{number}.pdf")
+    metadata = {"source": source, "invoice_number": f"INV{number:05d}", "customer_name": f"Customer {number % 17}",
+                "invoice_date": "01-03-2025", "total_value": number * 10.5}
+    return source, [Document(page_content=f"Invoice INV{number:05d} part {part}: {number * part} laptops",
+                             metadata=dict(metadata)) for part in range(chunks_per_invoice)]
+
+
+def build(embedding, invoices, chunks_per_invoice, skip=()):
+    vector_store_manager.store_manager = vector_store_manager.VectorStoreManager(embedding_function=embedding)
+    chunks = []
+    indexed = []
+    for number in range(invoices):
+        if number in skip:
+            continue
+        source, documents = invoice_chunks(number, chunks_per_invoice)
+        open(source, "wb").close()
+        chunks.extend(documents)
+        indexed.append((source, documents[0].metadata))
+    vector_store_manager.upsert_chunks(vector_store_manager.store_manager.get(), chunks, batch_size=1000)
+    vector_store_manager.invoice_index.add_many(indexed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--invoices", type=int, default=10000)
+    parser.add_argument("--chunks-per-invoice", type=int, default=3)
+    parser.add_argument("--remove", type=int, default=20)
+    args = parser.parse_args()
+
+    embedding = CountingEmbedding(size=768)
+    build(embedding, args.invoices, args.chunks_per_invoice)
+    print(f"{args.invoices} invoices, {vector_store_manager.store_manager.get()._collection.count()} chunks")
+
+    embedded_before = embedding.texts
+    latencies = []
+    for number in range(0, args.invoices, args.invoices // args.remove)[:args.remove]:
+        start = time.perf_counter()
+        status, _ = vector_store_manager.remove_from_vector_store(f"invoice{number}.pdf")
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    print(f"remove_from_vector_store  p50 {np.percentile(latencies, 50):7.1f} ms  max {latencies.max():7.1f} ms  "
+          f"texts embedded {embedding.texts - embedded_before}")
+    print(status)
+    print(f"metadata index rows: {vector_store_manager.invoice_index.count()}, "
+          f"pdfs left: {len(vector_store_manager.get_pdf_list())}")
+
+    embedding.texts = 0
+    start = time.perf_counter()
+    vector_store_manager.clear_all_data()
+    build(embedding, args.invoices, args.chunks_per_invoice, skip={0})
+    print(f"clear and rebuild         {time.perf_counter() - start:7.2f} s  texts embedded {embedding.texts}")
+
+
+if __name__ == "__main__":
+    main()
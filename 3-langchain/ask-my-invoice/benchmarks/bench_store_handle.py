@@ -0,0 +1,71 @@
+"""Per-question retrieval latency with a reopened vs a shared Chroma handle.
+
+Before, every question went through a new chromadb.PersistentClient and
+Chroma wrapper; now vector_store_manager.store_manager hands out one
+handle per process. Both are timed on the same collection, filled with
+--chunks synthetic invoice chunks and embedded with a deterministic fake
+embedding, so no API key or network is needed. LLM time is left out: it
+is the same in both cases.
+
+Run from the ask-my-invoice directory:  python benchmarks/bench_store_handle.py
+"""
+import argparse
+import time
+
+import _setup
+
+import chromadb
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import vector_store_manager
+from config import COLLECTION_NAME, VECTOR_STORE_DIR
+
+QUESTIONS = ["what is the total of invoice INV-102", "which invoices were billed to Acme",
+             "invoices issued in March", "what is the largest invoice"]
+
+
+def fill_store(store, chunks):
+    documents = [Document(page_content=f"Invoice INV-{number} billed to Customer {number % 17} total {number * 10.5}",
+                          metadata={"source": f"invoice{number}.pdf", "invoice_number": f"INV-{number}"})
+                 for number in range(chunks)]
+    store.add_documents(documents)
+
+
+def time_questions(open_store, repeat):
+    latencies = []
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            open_store().similarity_search(question, k=5)
+            latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=25)
+    args = parser.parse_args()
+
+    embedding = DeterministicFakeEmbedding(size=768)
+    manager = vector_store_manager.VectorStoreManager(embedding_function=embedding)
+    vector_store_manager.store_manager = manager
+    fill_store(manager.get(), args.chunks)
+
+    def reopen():
+        client = chromadb.PersistentClient(path=VECTOR_STORE_DIR)
+        return Chroma(client=client, collection_name=COLLECTION_NAME, embedding_function=embedding)
+
+    print(f"{args.chunks} chunks, {args.repeat * len(QUESTIONS)} questions")
+    print(f"{'':22} {'p50 ms':>8} {'p99 ms':>8}")
+    for label, open_store in (("reopen per question", reopen),
+                              ("shared handle", vector_store_manager.get_vector_store_instance)):
+        latencies = time_questions(open_store, args.repeat)
+        print(f"{label:22} {np.percentile(latencies, 50):8.2f} {np.percentile(latencies, 99):8.2f}")
+
+
+if __name__ == "__main__":
+    main()
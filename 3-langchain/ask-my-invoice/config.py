@@ -9,6 +9,11 @@ if not API_KEY or API_KEY == "":
 PDF_DIRS = "PDFs"
 VECTOR_STORE_DIR = "vector_store"
 COLLECTION_NAME = "ask-my-invoices"
+CACHE_DIR = ".cache"
+EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "embeddings.sqlite3")
+# invoice metadata, one row per pdf, kept next to the chroma collection it describes
+METADATA_INDEX_PATH = os.path.join(VECTOR_STORE_DIR, "invoice_metadata.sqlite3")
 
 os.makedirs(PDF_DIRS, exist_ok=True)
-os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
\ No newline at end of file
+os.makedirs(VECTOR_STORE_DIR, exist_ok=True)
+os.makedirs(CACHE_DIR, exist_ok=True)
\ No newline at end of file
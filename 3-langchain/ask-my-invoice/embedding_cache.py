@@ -0,0 +1,139 @@
+"""Vendored copy of embedding_cache.py at the repository root, keep the two in sync.
+ask-my-invoice runs from its own directory and cannot import it. Only
+CachedEmbeddings, the langchain wrapper at the end, is specific to this app.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def normalize_text(text):
+    """Normalize unicode and collapse whitespace so trivially different copies share a key"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model, text):
+    digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class EmbeddingCache:
+    """Persistent embedding cache keyed by (model name, hash of normalized text).
+       Vectors are stored as raw float32 bytes in SQLite and the least recently
+       used entries are evicted once the cache grows past max_bytes
+    """
+
+    def __init__(self, path, max_bytes=MAX_CACHE_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # every lookup writes last_used, WAL without a sync per commit keeps that cheap
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS embeddings (
+                                key TEXT PRIMARY KEY,
+                                vector BLOB NOT NULL,
+                                last_used REAL NOT NULL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model, texts):
+        """Return a list with a float32 vector for every cached text and None for every miss"""
+        keys = [cache_key(model, text) for text in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                                       [(now, key) for key in found])
+                self._conn.commit()
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+
+        return [np.frombuffer(found[key], dtype=np.float32) if key in found else None for key in keys]
+
+    def put_many(self, model, texts, vectors):
+        """Store one vector per text, then evict least recently used entries if over budget"""
+        now = time.time()
+        blobs = {cache_key(model, text): np.asarray(vector, dtype=np.float32).tobytes()
+                 for text, vector in zip(texts, vectors)}
+        rows = [(key, blob, now) for key, blob in blobs.items()]
+        with self._lock:
+            for key, blob, _ in rows:
+                old = self._conn.execute("SELECT LENGTH(vector) FROM embeddings WHERE key = ?", (key,)).fetchone()
+                self._size += len(blob) - (old[0] if old else 0)
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)", rows)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            oldest = self._conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used LIMIT 100").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if self._size <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._size -= size
+
+    def stats(self):
+        """Return hit/miss counters and the current size of the cache"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": self._size,
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps a langchain embeddings model so repeated texts are served from the EmbeddingCache"""
+
+    def __init__(self, underlying, cache, model_name):
+        self.underlying = underlying
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts):
+        vectors = self.cache.get_many(self.model_name, texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            new_vectors = self.underlying.embed_documents(missing)
+            self.cache.put_many(self.model_name, missing, new_vectors)
+            by_text = dict(zip(missing, new_vectors))
+            vectors = [vector if vector is not None else by_text[text] for text, vector in zip(texts, vectors)]
+        return [list(map(float, vector)) for vector in vectors]
+
+    def embed_query(self, text):
+        # query embeddings can use a different task type than documents, so they get their own key space
+        query_model = f"{self.model_name}:query"
+        vector = self.cache.get_many(query_model, [text])[0]
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self.cache.put_many(query_model, [text], [vector])
+        return list(map(float, vector))
@@ -1,8 +1,14 @@
 from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from config import API_KEY
+from config import API_KEY, EMBEDDING_CACHE_PATH
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+
+EMBEDDING_MODEL = "models/embedding-001"
 
 try:
-    embeddings = GoogleGenerativeAIEmbeddings(model ="models/embedding-001", google_api_key= API_KEY)
+    embeddings = CachedEmbeddings(
+        GoogleGenerativeAIEmbeddings(model =EMBEDDING_MODEL, google_api_key= API_KEY),
+        EmbeddingCache(EMBEDDING_CACHE_PATH),
+        EMBEDDING_MODEL)
     llm = ChatGoogleGenerativeAI(model="models/gemini-2.5-flash-lite-preview-06-17",google_api_key = API_KEY, temperature = 0)
 except Exception as e:
     raise RuntimeError(f"Failed to initialize the google models. Check you API key and network connection. Error: {e}")
@@ -2,12 +2,7 @@
 from metadata_schema import InvocieMetaData
 from llm_utils import llm
 
-def extract_metadata_from_document(doc_content:str)->dict:
-    """use metadata to extract data form the documents""" 
-    try:
-        parser_llm = llm.with_structured_output(InvocieMetaData)
-        
-        prompt = f"""
+PROMPT_TEMPLATE = """
         Extract the following invoice details from the document content provided below
         Ensure the 'invoice_date' is in format 'DD-MM-YYYY', 'invoice_number and 'custumer_name'
         are in string and 'total_value' is in float
@@ -16,7 +11,24 @@ def extract_metadata_from_document(doc_content:str)->dict:
         
         Extracted invoice details:
         """
-        extracted_data = parser_llm.invoke(prompt)
+
+parser_llm = llm.with_structured_output(InvocieMetaData)
+
+
+def extract_metadata_from_document(doc_content:str)->dict:
+    """use metadata to extract data form the documents""" 
+    try:
+        extracted_data = parser_llm.invoke(PROMPT_TEMPLATE.format(doc_content=doc_content))
+    except Exception as e:
+       return None
+
+    return extracted_data.dict()
+
+
+async def extract_metadata_from_document_async(doc_content:str)->dict:
+    """Same as extract_metadata_from_document, without blocking the event loop while the LLM answers"""
+    try:
+        extracted_data = await parser_llm.ainvoke(PROMPT_TEMPLATE.format(doc_content=doc_content))
     except Exception as e:
        return None
 
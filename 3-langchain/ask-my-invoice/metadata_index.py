@@ -0,0 +1,280 @@
+import calendar
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+
+# invoice dates come from the LLM as DD-MM-YYYY, other common layouts are accepted too
+DATE_FORMATS = ("%d-%m-%Y", "%d/%m/%Y", "%d.%m.%Y", "%Y-%m-%d", "%Y/%m/%d")
+DATE_PATTERN = re.compile(r"\b(\d{1,2}[-/.]\d{1,2}[-/.]\d{4}|\d{4}[-/]\d{1,2}[-/]\d{1,2})\b")
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+MONTH_PATTERN = re.compile(r"\b(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\b(?:\s*,?\s*(\d{4}))?")
+CURRENCY = r"(?:rs\.?|inr|₹|\$|usd|eur|€|dollars?|rupees?)"
+# an amount is a number with an optional currency, followed by the end of the question,
+# punctuation or a joining word; "over 3 pages" is not an amount
+AMOUNT = (rf"(?:{CURRENCY}\s*)?(\d[\d,]*+(?:\.\d+)?)(?:\s*{CURRENCY}(?!\w))?"
+          rf"(?=\s*(?:$|[?.!,;)]|(?:or|and|in|for|of|on|to|from|during|after|before|since|until|by|with)\b))")
+MIN_AMOUNT_PATTERNS = [
+    re.compile(rf"(?:\b(?:above|over|more than|greater than|at least|exceeding)|>=?)\s*{AMOUNT}"),
+    re.compile(rf"{AMOUNT}\s*(?:or more|or above|and above|\+)"),
+]
+MAX_AMOUNT_PATTERNS = [
+    re.compile(rf"(?:\b(?:below|under|less than|at most)|<=?)\s*{AMOUNT}"),
+    re.compile(rf"{AMOUNT}\s*(?:or less|or below|and below)"),
+]
+BETWEEN_AMOUNTS_PATTERN = re.compile(rf"\bbetween\s+{AMOUNT}\s+and\s+{AMOUNT}")
+# only plausible years, and not a number followed by a currency, "value" or "or more"
+YEAR_PATTERN = re.compile(rf"\b(?:in|during|of|for|year)\s+((?:19|20)\d{{2}})\b"
+                          rf"(?!\s*(?:{CURRENCY}|value|amount|or more|or less|or above|or below|and above|and below|\+))")
+# what is left of a question once everything recognised is taken out and still
+# looks like a constraint: numbers and comparison words
+UNPARSED_PATTERN = re.compile(r"\d[\d,.]*|\b(?:above|over|more than|greater than|less than|fewer than|under|below|"
+                              r"at least|at most|exceed\w*)\b|[<>]")
+MAX_SOURCES = 20
+
+
+def parse_date(text):
+    """Return the date in text as an ISO string, None if it is not a date"""
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text.strip(), date_format).date().isoformat()
+        except (AttributeError, ValueError):
+            continue
+    return None
+
+
+class InvoiceQuery:
+    """Filters recognised in a question, every one that is set must match.
+       Dates are ISO strings, both ends of the date and total ranges are inclusive.
+       unparsed lists the numbers and comparison words of the question that
+       none of the filters account for
+    """
+
+    def __init__(self, invoice_numbers=(), customers=(), date_from=None, date_to=None,
+                 min_total=None, max_total=None, unparsed=()):
+        self.invoice_numbers = list(invoice_numbers)
+        self.customers = list(customers)
+        self.date_from = date_from
+        self.date_to = date_to
+        self.min_total = min_total
+        self.max_total = max_total
+        self.unparsed = list(unparsed)
+
+    def is_empty(self):
+        return not (self.invoice_numbers or self.customers or self.date_from or self.date_to
+                    or self.min_total is not None or self.max_total is not None)
+
+    def describe(self):
+        parts = []
+        if self.invoice_numbers:
+            parts.append("invoice " + ", ".join(self.invoice_numbers))
+        if self.customers:
+            parts.append("customer " + ", ".join(self.customers))
+        if self.date_from or self.date_to:
+            parts.append(f"dated {self.date_from or 'any'} to {self.date_to or 'any'}")
+        if self.min_total is not None or self.max_total is not None:
+            low = "any" if self.min_total is None else f"{self.min_total:g}"
+            high = "any" if self.max_total is None else f"{self.max_total:g}"
+            parts.append(f"total {low} to {high}")
+        return "; ".join(parts) if parts else "all invoices"
+
+    def to_sql(self):
+        """Returns (where clause, parameters)"""
+        clauses = []
+        params = []
+        if self.invoice_numbers:
+            clauses.append(f"invoice_number IN ({','.join('?' * len(self.invoice_numbers))})")
+            params += self.invoice_numbers
+        if self.customers:
+            clauses.append(f"customer_name IN ({','.join('?' * len(self.customers))})")
+            params += self.customers
+        if self.date_from:
+            clauses.append("invoice_date >= ?")
+            params.append(self.date_from)
+        if self.date_to:
+            clauses.append("invoice_date <= ?")
+            params.append(self.date_to)
+        if self.min_total is not None:
+            clauses.append("total_value >= ?")
+            params.append(self.min_total)
+        if self.max_total is not None:
+            clauses.append("total_value <= ?")
+            params.append(self.max_total)
+        return " AND ".join(clauses) or "1", params
+
+
+def _take(pattern, text):
+    """Returns (matches, text with the matched spans blanked out)"""
+    matches = list(pattern.finditer(text))
+    for match in matches:
+        text = text[:match.start()] + " " * (match.end() - match.start()) + text[match.end():]
+    return matches, text
+
+
+def _amount(text):
+    return float(text.replace(",", ""))
+
+
+def parse_amount_range(text):
+    """Returns (min_total, max_total, text without them) for "above 5000", "2500 or more", "between 1000 and 2000", ..."""
+    min_total = max_total = None
+    matches, text = _take(BETWEEN_AMOUNTS_PATTERN, text)
+    for match in matches:
+        low, high = sorted((_amount(match.group(1)), _amount(match.group(2))))
+        min_total, max_total = low, high
+    for pattern in MIN_AMOUNT_PATTERNS:
+        matches, text = _take(pattern, text)
+        for match in matches:
+            min_total = _amount(match.group(1))
+    for pattern in MAX_AMOUNT_PATTERNS:
+        matches, text = _take(pattern, text)
+        for match in matches:
+            max_total = _amount(match.group(1))
+    return min_total, max_total, text
+
+
+def parse_date_range(text):
+    """Returns (date_from, date_to, text without them) for explicit dates, "march 2025" or "in 2025" in text"""
+    matches, rest = _take(DATE_PATTERN, text)
+    dates = [found for found in (parse_date(match.group(1)) for match in matches) if found]
+    if len(dates) >= 2:
+        return min(dates[:2]), max(dates[:2]), rest
+    if len(dates) == 1:
+        if re.search(r"\b(after|since|from)\b", text):
+            return dates[0], None, rest
+        if re.search(r"\b(before|until|till|up to)\b", text):
+            return None, dates[0], rest
+        return dates[0], dates[0], rest
+
+    for match in MONTH_PATTERN.finditer(text):
+        month_name, year = match.groups()
+        # "may" and "mar" are too common as words to count without a year
+        if not year:
+            continue
+        month = MONTHS[month_name]
+        last_day = calendar.monthrange(int(year), month)[1]
+        rest = text[:match.start()] + " " * (match.end() - match.start()) + text[match.end():]
+        return date(int(year), month, 1).isoformat(), date(int(year), month, last_day).isoformat(), rest
+
+    matches, rest = _take(YEAR_PATTERN, text)
+    if matches:
+        year = matches[0].group(1)
+        return f"{year}-01-01", f"{year}-12-31", rest
+    return None, None, text
+
+
+def _name_matcher(stored_names):
+    """({lower cased name: [stored spellings]}, regex matching any of the names as whole words)"""
+    names = {}
+    for name in stored_names:
+        if name:
+            names.setdefault(name.lower(), []).append(name)
+    # longest first, so "acme corp" wins over "acme"
+    alternatives = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    return names, re.compile(r"(?<!\w)(" + alternatives + r")(?!\w)")
+
+
+class InvoiceIndex:
+    """SQLite table with one row per ingested pdf and its InvocieMetaData fields.
+       Filled at ingest, it answers count/total/average questions exactly over
+       every invoice instead of the top k chunks a retriever returns.
+       invoice_date is stored as an ISO string so date ranges are index range scans
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._names = None
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS invoices (
+                                source TEXT PRIMARY KEY,
+                                invoice_number TEXT COLLATE NOCASE,
+                                customer_name TEXT COLLATE NOCASE,
+                                invoice_date TEXT,
+                                total_value REAL)""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_invoice_date ON invoices(invoice_date)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_customer_name ON invoices(customer_name)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_invoice_number ON invoices(invoice_number)")
+        self._conn.commit()
+
+    def add_many(self, items):
+        """Insert or replace one row per (source, metadata) pair"""
+        rows = []
+        for source, metadata in items:
+            total_value = metadata.get("total_value")
+            rows.append((source, metadata.get("invoice_number"), metadata.get("customer_name"),
+                         parse_date(metadata.get("invoice_date")),
+                         float(total_value) if total_value is not None else None))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO invoices VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._names = None
+
+    def remove(self, source):
+        """Delete the row of one pdf, returns True if it was indexed"""
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM invoices WHERE source = ?", (source,)).rowcount
+            self._conn.commit()
+            self._names = None
+        return removed > 0
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM invoices")
+            self._conn.commit()
+            self._names = None
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM invoices").fetchone()[0]
+
+    def known_names(self):
+        """Returns (invoice numbers, customer names) in the index, cached until the next write.
+           Each is a dict from the lower cased name to its stored spellings and a regex matching any of them
+        """
+        with self._lock:
+            if self._names is None:
+                self._names = tuple(_name_matcher(row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT {column} COLLATE BINARY FROM invoices WHERE {column} != ''"))
+                                    for column in ("invoice_number", "customer_name"))
+            return self._names
+
+    def parse(self, question):
+        """Compile the invoice numbers, customer names, dates and total amounts mentioned
+           in question into an InvoiceQuery; numbers and comparison words left over are
+           reported in its unparsed list
+        """
+        text = question.lower()
+        found = []
+        for names, pattern in self.known_names():
+            matches, text = _take(pattern, text) if names else ([], text)
+            found.append([name for match in dict.fromkeys(match.group(1) for match in matches)
+                          for name in names[match]])
+        date_from, date_to, text = parse_date_range(text)
+        min_total, max_total, text = parse_amount_range(text)
+        unparsed = [match.group(0) for match in UNPARSED_PATTERN.finditer(text)]
+        return InvoiceQuery(found[0], found[1], date_from, date_to, min_total, max_total, unparsed)
+
+    def sources(self, query):
+        """Returns the source of every invoice matching query"""
+        where, params = query.to_sql()
+        with self._lock:
+            return [row[0] for row in self._conn.execute(f"SELECT source FROM invoices WHERE {where}", params)]
+
+    def aggregate(self, query):
+        """Returns count, total, average, min, max and the sources of the invoices matching query"""
+        where, params = query.to_sql()
+        with self._lock:
+            count, total, average, smallest, largest = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(total_value), 0), AVG(total_value), MIN(total_value), MAX(total_value) "
+                f"FROM invoices WHERE {where}", params).fetchone()
+            sources = [row[0] for row in self._conn.execute(
+                f"SELECT source FROM invoices WHERE {where} ORDER BY invoice_date, source LIMIT ?",
+                params + [MAX_SOURCES])]
+        return {"count": count, "total": total, "average": average or 0.0,
+                "min": smallest, "max": largest, "sources": sources}
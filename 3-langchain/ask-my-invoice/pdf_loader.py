@@ -0,0 +1,9 @@
+"""Runs in the pdf worker processes, so it imports nothing but the pdf loader:
+no config (and API key), no LLM clients, no gradio
+"""
+from langchain_community.document_loaders import PyPDFLoader
+
+
+def load_pdf_pages(pdf_path):
+    """Parse a pdf into one document per page"""
+    return PyPDFLoader(pdf_path).load()
@@ -1,57 +1,20 @@
 from langchain.prompts import PromptTemplate
 from langchain.chains import RetrievalQA
 from langchain.retrievers.self_query.base import SelfQueryRetriever
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+from langchain_core.runnables import RunnableParallel
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.callbacks import BaseCallbackHandler
+from contextlib import contextmanager
 import os 
+import threading
 
 from llm_utils import llm
 from metadata_schema import DOCUMENT_DESCRIPTION, metadata_field_info
-from vector_store_manager import get_vector_store_instance
-
-def get_qa_chain():
-    """Build and returns a SelfQueryRetriever"""
-    vector_store_instance = get_vector_store_instance()
-    if vector_store_instance == None:
-        return None
-    
-    return SelfQueryRetriever.from_llm(
-            llm=llm,
-            vectorstore= vector_store_instance,
-            document_contents=DOCUMENT_DESCRIPTION,
-            metadata_field_info= metadata_field_info,
-            verbose = True,
-            search_kwargs={"k":5}
-        )
+from vector_store_manager import get_vector_store_instance, get_invoice_index
+from query_router import QueryRouter
+from timing import timed, format_timings
 
-def get_answer(question):
-    if not question:
-        return "Please Enter the Question to answer"
-    
-    retriever = get_qa_chain()
-    if retriever == None:
-        return " There is no knowledgebase to answer. please upload the pdfs"
-
-    retrive_docs = retriever.invoke(question)
-
-    if any(word in question.lower() for word in ["total", "sum", "count", "average"] ):
-        total = 0
-        invoicecount = 0
-        seen_invoices = set()
-
-        for doc in retrive_docs:
-            invoice_id  = (doc.metadata.get("invoice_number"),doc.metadata.get("source"))
-            if invoice_id not in seen_invoices:
-                total += doc.metadata.get("total_value",0)
-                invoicecount += 1
-                seen_invoices.add(invoice_id)
-        
-        answer = f"found {invoicecount} invoices: The total value is {total}"
-        #sources = "\n".join([ f"-{os.path.basename(doc.metadata.get("source","unknown"))}" for doc in retrive_docs]) 
-        sources = "\n".join([ f"-{os.path.basename(doc.metadata.get('source', 'Unknown'))}" for doc in retrive_docs])
-        return answer, sources
-    else:
-        prompt_template = """
+prompt_template = """
         Use the given context from the uploaded documents give answer to the questions at the end;
         if you don't know the answer based on the given context just say so, don't make up any answer
         on your own. keep the answer precise and helpful
@@ -64,25 +27,160 @@ def get_answer(question):
         Helpful answer:
         """
 
-        QA_PROMPT = PromptTemplate.from_template(prompt_template)
-
-        rag_chain = (
-            {"context": retriever , "question": RunnablePassthrough()}
-            |QA_PROMPT
-            |llm
-            |StrOutputParser()
-        )
-
-        answer = rag_chain.invoke(question)
-        sources = "\n".join([ f"-{os.path.basename(doc.metadata.get("source","unknown"))}" for doc in retrive_docs])
-        return answer, sources
-
-
-
-
-
-
-
+QA_PROMPT = PromptTemplate.from_template(prompt_template)
+# questions with these words are answered from the metadata index, without the LLM
+AGGREGATE_WORDS = ["total", "sum", "count", "average"]
+SEARCH_K = 5
+# the context is filled with the documents retrieved once per question, so the
+# chain does not run the retriever (and its query constructor LLM call) again
+rag_chain = QA_PROMPT | llm | StrOutputParser()
+
+
+def format_docs(docs):
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+class AnswerTrace(BaseCallbackHandler):
+    """Stage timings and LLM calls of one question.
+       Passed as a callback to every runnable on the answer path; each LLM
+       call is recorded under the stage that was running when it started
+    """
+
+    def __init__(self):
+        self.timings = {}
+        self.llm_calls = []
+        self._stage = None
+
+    @contextmanager
+    def stage(self, name):
+        self._stage = name
+        try:
+            with timed(self.timings, name):
+                yield
+        finally:
+            self._stage = None
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        # chat models report here as well, the callback manager falls back to on_llm_start
+        self.llm_calls.append(self._stage)
+
+    def format(self):
+        return format_timings(self.timings) + f"\nllm calls: {len(self.llm_calls)} ({', '.join(map(str, self.llm_calls))})"
+
+
+class QAChainCache:
+    """The SelfQueryRetriever of the current vector store handle.
+       Building it sets up the query constructor prompt, parser and LLM
+       binding, so it is built once and only rebuilt when the store manager
+       hands out a new handle, i.e. after the collection was reset
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._store = None
+        self._retriever = None
+
+    def get(self, trace):
+        """Returns the retriever, None when there is no vector store"""
+        vector_store_instance = get_vector_store_instance()
+        if vector_store_instance == None:
+            return None
+        with self._lock:
+            if vector_store_instance is not self._store:
+                with trace.stage("retriever build"):
+                    retriever = SelfQueryRetriever.from_llm(
+                            llm=llm,
+                            vectorstore= vector_store_instance,
+                            document_contents=DOCUMENT_DESCRIPTION,
+                            metadata_field_info= metadata_field_info,
+                            verbose = True,
+                            search_kwargs={"k":SEARCH_K}
+                        )
+                    self._retriever = retriever
+                    self._store = vector_store_instance
+            return self._retriever
+
+
+chain_cache = QAChainCache()
+query_router = QueryRouter(get_invoice_index)
+
+
+def retrieve(retriever, question, trace):
+    """Same as retriever.invoke(question), with query construction and vector search timed apart.
+       The structured query is translated into the vector store search here, from the
+       retriever's public fields, the same way the retriever does it
+    """
+    with trace.stage("query construction"):
+        structured_query = retriever.query_constructor.invoke({"query": question}, config={"callbacks": [trace]})
+    with trace.stage("vector search"):
+        new_query, search_kwargs = retriever.structured_query_translator.visit_structured_query(structured_query)
+        if structured_query.limit is not None:
+            search_kwargs["k"] = structured_query.limit
+        if retriever.use_original_query:
+            new_query = question
+        return retriever.vectorstore.search(new_query, retriever.search_type,
+                                            **{**retriever.search_kwargs, **search_kwargs})
+
+
+def answer_aggregate(question, trace):
+    """Count, total and average over every invoice matching the invoice numbers,
+       customers, dates and total amounts in the question, computed exactly in the metadata index
+    """
+    with trace.stage("metadata query"):
+        invoice_index = get_invoice_index()
+        query = invoice_index.parse(question)
+        result = invoice_index.aggregate(query)
+    # say what was not understood rather than answer confidently for a different question
+    ignored = f" (could not use: {', '.join(query.unparsed)})" if query.unparsed else ""
+    if result["count"] == 0:
+        return f"found no invoices for {query.describe()}{ignored}", ""
+
+    answer = f"found {result['count']} invoices ({query.describe()}): The total value is {round(result['total'], 2)}"
+    if "average" in question.lower():
+        answer += f", the average value is {round(result['average'], 2)}"
+    answer += ignored
+    sources = "\n".join([ f"-{os.path.basename(source)}" for source in result["sources"]])
+    if result["count"] > len(result["sources"]):
+        sources += f"\n- and {result['count'] - len(result['sources'])} more"
+    return answer, sources
+
+
+def answer_question(question):
+    """Returns (answer, sources, trace). Aggregate questions go to the metadata
+       index; for the rest the documents are retrieved once, with a filter from
+       the query router or else the LLM query constructor, and used for both
+       the prompt context and the sources list
+    """
+    trace = AnswerTrace()
+    if any(word in question.lower() for word in AGGREGATE_WORDS):
+        answer, sources = answer_aggregate(question, trace)
+        return answer, sources, trace
+
+    retriever = chain_cache.get(trace)
+    if retriever == None:
+        return " There is no knowledgebase to answer. please upload the pdfs", "", trace
+
+    with trace.stage("query routing"):
+        routed, where = query_router.route(question)
+    if routed and where is None:
+        return "There are no invoices matching the question in the knowledgebase", "", trace
+    if routed:
+        with trace.stage("vector search"):
+            retrive_docs = retriever.vectorstore.similarity_search(question, k=SEARCH_K, filter=where)
+    else:
+        retrive_docs = retrieve(retriever, question, trace)
+    with trace.stage("generation"):
+        answer = rag_chain.invoke({"context": format_docs(retrive_docs), "question": question},
+                                  config={"callbacks": [trace]})
+    sources = "\n".join([ f"-{os.path.basename(doc.metadata.get("source","unknown"))}" for doc in retrive_docs])
+    return answer, sources, trace
 
 
+def get_answer(question):
+    if not question:
+        return "Please Enter the Question to answer"
 
+    answer, sources, trace = answer_question(question)
+    print(trace.format())
+    print(f"query router: {query_router.stats()}")
+    return answer, sources
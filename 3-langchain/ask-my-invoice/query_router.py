@@ -0,0 +1,65 @@
+import threading
+
+from metadata_index import InvoiceQuery
+
+
+def chroma_where(query, index):
+    """Chroma where filter for an InvoiceQuery, None when no invoice can match it.
+       Invoice numbers, customers and totals are chunk metadata and filtered on directly;
+       chroma cannot compare the DD-MM-YYYY dates, so a date range becomes the
+       sources the metadata index finds for it
+    """
+    clauses = []
+    if query.invoice_numbers:
+        clauses.append({"invoice_number": {"$in": query.invoice_numbers}})
+    if query.customers:
+        clauses.append({"customer_name": {"$in": query.customers}})
+    if query.min_total is not None:
+        clauses.append({"total_value": {"$gte": query.min_total}})
+    if query.max_total is not None:
+        clauses.append({"total_value": {"$lte": query.max_total}})
+    if query.date_from or query.date_to:
+        sources = index.sources(InvoiceQuery(date_from=query.date_from, date_to=query.date_to))
+        if not sources:
+            return None
+        clauses.append({"source": {"$in": sources}})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class QueryRouter:
+    """Rule based fast path in front of the SelfQueryRetriever.
+       Questions naming invoice numbers or customers that are in the metadata
+       index, a date range or a total amount range get their where filter built
+       directly and skip the query constructor LLM call. Questions with nothing
+       recognised, or with numbers or comparison words the parser could not
+       place (InvoiceQuery.unparsed), are ambiguous and go to the LLM
+    """
+
+    def __init__(self, get_index):
+        self.get_index = get_index
+        self._lock = threading.Lock()
+        self.fast_path = 0
+        self.llm_path = 0
+
+    def route(self, question):
+        """Returns (routed, where). routed is False when the LLM has to build the
+           filter; otherwise where is the filter, None if no invoice can match
+        """
+        index = self.get_index()
+        query = index.parse(question)
+        with self._lock:
+            if query.is_empty() or query.unparsed:
+                self.llm_path += 1
+                return False, None
+            self.fast_path += 1
+        return True, chroma_where(query, index)
+
+    def stats(self):
+        """Returns how many questions took each path and the fraction that took the fast path"""
+        with self._lock:
+            routed = self.fast_path + self.llm_path
+            return {
+                "fast_path": self.fast_path,
+                "llm_path": self.llm_path,
+                "fast_path_rate": self.fast_path / routed if routed else 0.0,
+            }
@@ -1,18 +1,81 @@
 import os
-from config import PDF_DIRS, VECTOR_STORE_DIR, COLLECTION_NAME
+from config import PDF_DIRS, VECTOR_STORE_DIR, COLLECTION_NAME, METADATA_INDEX_PATH
 from llm_utils import embeddings
 import chromadb
 from langchain_chroma import Chroma
-from langchain_community.document_loaders import PyPDFLoader
-from metadata_extractor import extract_metadata_from_document
+from pdf_loader import load_pdf_pages
+from metadata_extractor import extract_metadata_from_document_async
+from metadata_index import InvoiceIndex
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import shutil
+import threading
+import hashlib
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from langchain_core.rate_limiters import InMemoryRateLimiter
 import gradio as gr
 
 
 
 
-vector_store_instance = None
+class VectorStoreManager:
+    """Owns the one chromadb client and Chroma collection of the process.
+       get() opens them on first use and then hands out the same handle;
+       reset() deletes the collection through that client and the next get()
+       creates it again. Both are safe to call from gradio's worker threads
+    """
+
+    def __init__(self, path=VECTOR_STORE_DIR, collection_name=COLLECTION_NAME, embedding_function=embeddings):
+        self.path = path
+        self.collection_name = collection_name
+        self.embedding_function = embedding_function
+        self._lock = threading.RLock()
+        self._client = None
+        self._store = None
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = chromadb.PersistentClient(path=self.path)
+            return self._client
+
+    def get(self):
+        with self._lock:
+            if self._store is None:
+                self._store = Chroma(client=self.client,
+                                     collection_name=self.collection_name,
+                                     embedding_function=self.embedding_function)
+            return self._store
+
+    def reset(self):
+        """Delete the collection, the handle is reopened on the next get()"""
+        with self._lock:
+            self._store = None
+            try:
+                self.client.delete_collection(name=self.collection_name)
+            except Exception as e:
+                print(f"Could not clear collection (it might not exist): {e}")
+
+
+store_manager = VectorStoreManager()
+invoice_index = InvoiceIndex(METADATA_INDEX_PATH)
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+# chunks embedded and written to Chroma per call
+UPSERT_BATCH_SIZE = 64
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+# pdfs are parsed in at most this many processes, metadata is extracted by at most METADATA_CONCURRENCY
+# LLM calls at a time and METADATA_REQUESTS_PER_MINUTE calls a minute, to stay under the API quota.
+# Every pdf worker imports the whole app once, so a few are enough
+PDF_WORKERS = min(4, os.cpu_count() or 1)
+METADATA_CONCURRENCY = 8
+METADATA_REQUESTS_PER_MINUTE = 60
+metadata_rate_limiter = InMemoryRateLimiter(requests_per_second=METADATA_REQUESTS_PER_MINUTE / 60,
+                                            check_every_n_seconds=0.05,
+                                            max_bucket_size=METADATA_CONCURRENCY)
 
 #Loading the PDFs
 def get_pdf_list():
@@ -22,27 +85,106 @@ def get_pdf_list():
 
 #Get vector store
 def get_vector_store_instance():
-    global vector_store_instance
+    try:
+        return store_manager.get()
+    except Exception as e:
+        print(f"Error in getting the vector store : {e}")
+        return None
+
+
+#Get the invoice metadata index
+def get_invoice_index():
+    """The metadata index, filled from the chunk metadata in chroma when it is
+       empty but the store is not, i.e. for a knowledge base built before the index
+    """
+    if invoice_index.count() == 0:
+        vector_store_instance = get_vector_store_instance()
+        if vector_store_instance is not None:
+            metadatas = vector_store_instance.get(include=["metadatas"])["metadatas"]
+            by_source = {metadata["source"]: metadata for metadata in metadatas if metadata.get("source")}
+            if by_source:
+                invoice_index.add_many(by_source.items())
+    return invoice_index
+
+
+#Splitting a pdf and writing its chunks
+_pdf_pool = None
+_pdf_pool_workers = 0
+_pdf_pool_lock = threading.Lock()
+
+
+def get_pdf_pool(file_count):
+    """The process pool that runs pdf_loader.load_pdf_pages, started on first use and kept.
+       Workers are spawned, not forked: forking a process that has gradio's threads,
+       chromadb and the LLM's gRPC client can deadlock. Spawned workers still import
+       the main script once, so they are started once per app rather than per upload,
+       one per file up to PDF_WORKERS. A larger upload replaces the pool with a bigger one
+    """
+    global _pdf_pool, _pdf_pool_workers
+    workers = min(PDF_WORKERS, max(1, file_count))
+    with _pdf_pool_lock:
+        if _pdf_pool is None or _pdf_pool_workers < workers:
+            if _pdf_pool is not None:
+                # files already submitted to the old pool still finish
+                _pdf_pool.shutdown(wait=False)
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pdf_pool_workers = workers
+        return _pdf_pool
 
-    if vector_store_instance is None:
-        try:
-            client = chromadb.PersistentClient(path=VECTOR_STORE_DIR)
-            vector_store_instance = Chroma(
-                client=client,
-                collection_name=COLLECTION_NAME, 
-                embedding_function= embeddings)
-        except Exception as e:
-            print(f"Error in getting the vector store : {e}") 
-            return None
-        return vector_store_instance
+
+def split_pages(doc_pages, metadata, pdf_path):
+    """Attach the invoice metadata to every page and split the pages, once per file"""
+    for page in doc_pages:
+        page.metadata.update(metadata)
+        page.metadata['source'] = pdf_path
+    return text_splitter.split_documents(documents=doc_pages)
+
+
+async def load_and_split(pdf_path, pdf_pool, semaphore):
+    """Returns (pdf_path, chunks), chunks is None when the file could not be processed"""
+    try:
+        # the worker's working directory is not guaranteed to be ours, it gets an absolute path
+        doc_pages = await asyncio.get_running_loop().run_in_executor(pdf_pool, load_pdf_pages, os.path.abspath(pdf_path))
+        async with semaphore:
+            await metadata_rate_limiter.aacquire()
+            metadata = await extract_metadata_from_document_async(doc_pages[0].page_content)
+        return pdf_path, split_pages(doc_pages, metadata, pdf_path)
+    except Exception as e:
+        print("error",e)
+        return pdf_path, None
+
+
+def chunk_id(chunk):
+    """Deterministic id from the file name and the chunk text, adding a chunk again overwrites it"""
+    source = os.path.basename(chunk.metadata.get("source", ""))
+    return hashlib.sha256(f"{source}\0{chunk.page_content}".encode("utf-8")).hexdigest()
+
+
+def upsert_chunks(vector_store, chunks, batch_size=UPSERT_BATCH_SIZE):
+    """Write chunks in batches of batch_size, skipping ids that are already stored so
+       no chunk is embedded twice. Returns the number of chunks written
+    """
+    # identical text within one file, e.g. a repeated footer, is stored once
+    unique = {chunk_id(chunk): chunk for chunk in chunks}
+    written = 0
+    ids = list(unique)
+    for start in range(0, len(ids), batch_size):
+        batch_ids = ids[start:start + batch_size]
+        existing = set(vector_store.get(ids=batch_ids, include=[])["ids"])
+        new_ids = [doc_id for doc_id in batch_ids if doc_id not in existing]
+        if new_ids:
+            vector_store.add_documents(documents=[unique[doc_id] for doc_id in new_ids], ids=new_ids)
+            written += len(new_ids)
+    return written
 
 
 #Adding Vector Store
-def add_to_vector_store(files):
+async def add_to_vector_store(files):
     """Adds new, non duplicate pdf to the vector store.
-       Checks for existing filenames to prevent duplication 
+       Checks for existing filenames to prevent duplication.
+       Files are parsed in a process pool and their metadata extracted
+       concurrently; the status is yielded again every time a file completes
     """
-    global vector_store_instance
     new_pdf_paths = []
     skipped_files = []
     for file in files:
@@ -56,55 +198,43 @@ def add_to_vector_store(files):
     if not new_pdf_paths:
         status = "Status : all files are already available in the knowledge base"
         if skipped_files:
-            status += f" skipped : {",".join(skipped_files)}"
-        return status, gr.update(choices=get_pdf_list())
+            status += f" skipped : {','.join(skipped_files)}"
+        yield status, gr.update(choices=get_pdf_list())
+        return
 
-    document = []
     failed_files = []
+    pending_chunks = []
+    pending_invoices = []
+    added_chunks = 0
+    semaphore = asyncio.Semaphore(METADATA_CONCURRENCY)
+    yield f"Status: processing {len(new_pdf_paths)} files", gr.update()
 
-    for pdf_path in new_pdf_paths:
-        try:
-            loader = PyPDFLoader(pdf_path)
-            doc_pages = loader.load()
-            metadata = extract_metadata_from_document(doc_pages[0].page_content)
-            
-            for page in doc_pages:
-                page.metadata.update(metadata)
-                page.metadata['source'] = pdf_path
-
-            document.extend(doc_pages)
-            
-        except Exception as e:
-            print("error",e)
-            failed_files.extend(os.path.basename(pdf_path))
-
-        texts = RecursiveCharacterTextSplitter(chunk_size= 1000,chunk_overlap = 200).split_documents(documents=document)
-
-        if vector_store_instance is None:
-            client = chromadb.PersistentClient(VECTOR_STORE_DIR)
-            vector_store_instance = Chroma(client = client,
-                                           collection_name= COLLECTION_NAME, 
-                                           embedding_function=embeddings)
-            if vector_store_instance._collection.count() == 0:
-                vector_store_instance = Chroma.from_documents(client =client,
-                                                              collection_name = COLLECTION_NAME,
-                                                              embedding= embeddings,
-                                                              documents= texts,
-                                                              persist_directory= VECTOR_STORE_DIR
-                                                              )
-            else:
-                vector_store_instance.add_documents(documents=texts)
-
+    pdf_pool = get_pdf_pool(len(new_pdf_paths))
+    tasks = [load_and_split(pdf_path, pdf_pool, semaphore) for pdf_path in new_pdf_paths]
+    for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+        pdf_path, chunks = await task
+        if chunks is None:
+            failed_files.append(os.path.basename(pdf_path))
         else:
-            vector_store_instance.add_documents(documents=texts)
-        
+            pending_chunks.extend(chunks)
+            pending_invoices.append((pdf_path, chunks[0].metadata if chunks else {}))
+        if len(pending_chunks) >= UPSERT_BATCH_SIZE:
+            added_chunks += await asyncio.to_thread(upsert_chunks, store_manager.get(), pending_chunks)
+            # the invoices are indexed once their chunks are stored
+            invoice_index.add_many(pending_invoices)
+            pending_chunks = []
+            pending_invoices = []
+        yield f"Status: processed {done}/{len(new_pdf_paths)} files, {len(failed_files)} failed", gr.update()
+
+    added_chunks += await asyncio.to_thread(upsert_chunks, store_manager.get(), pending_chunks)
+    invoice_index.add_many(pending_invoices)
 
-    total_docs_in_chromadb = vector_store_instance._collection.count()
-    status = f"Added {len(new_pdf_paths) - len(failed_files)}  new files, we have {total_docs_in_chromadb} are there in chromadb " 
+    total_docs_in_chromadb = store_manager.get()._collection.count()
+    status = f"Added {len(new_pdf_paths) - len(failed_files)}  new files ({added_chunks} new chunks), we have {total_docs_in_chromadb} are there in chromadb " 
     status += f"{len(failed_files)} are failed ."
-    status += f"failed to process {", ".join(failed_files)}."
+    status += f"failed to process {', '.join(failed_files)}."
     
-    return status, gr.update(choices=get_pdf_list())
+    yield status, gr.update(choices=get_pdf_list())
 
     
 
@@ -113,6 +243,25 @@ def add_to_vector_store(files):
 
 
 #Removing one pdf Vector Store 
+def remove_from_vector_store(pdf_name):
+    """Removes one pdf: its chunks from chroma, its row in the metadata index and
+       the file in PDFs. The other invoices are not touched, nothing is re-embedded
+    """
+    if not pdf_name:
+        return "Status: select a pdf to remove", gr.update(choices=get_pdf_list())
+
+    pdf_path = os.path.join(PDF_DIRS, os.path.basename(pdf_name))
+    vector_store_instance = store_manager.get()
+    where = {"source": pdf_path}
+    removed_chunks = len(vector_store_instance.get(where=where, include=[])["ids"])
+    vector_store_instance.delete(where=where)
+    invoice_index.remove(pdf_path)
+    if os.path.exists(pdf_path):
+        os.remove(pdf_path)
+
+    status = f"Status: removed {os.path.basename(pdf_path)} ({removed_chunks} chunks), "
+    status += f"we have {vector_store_instance._collection.count()} are there in chromadb"
+    return status, gr.update(choices=get_pdf_list(), value=None)
 
 
 
@@ -121,14 +270,8 @@ def add_to_vector_store(files):
 
 def clear_all_data():
     """Clears the vector store collection and all PDFs."""
-    global vector_store_instance
-    vector_store_instance = None
-    
-    try:
-        client = chromadb.PersistentClient(path=VECTOR_STORE_DIR)
-        client.delete_collection(name=COLLECTION_NAME)
-    except Exception as e:
-        print(f"Could not clear collection (it might not exist): {e}")
+    store_manager.reset()
+    invoice_index.clear()
 
     if os.path.exists(PDF_DIRS):
         shutil.rmtree(PDF_DIRS)
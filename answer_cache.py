@@ -0,0 +1,136 @@
+"""Two tier cache of chat answers.
+
+The exact tier matches the normalized question and a hash of the context it
+was answered from. The semantic tier reuses an answer when the question's
+embedding is within a cosine threshold of a cached question that was
+answered from the same context, so "who is the cto?" can reuse the answer
+to "Who's the CTO of the company?". Entries expire after ttl seconds and the
+least recently used ones are dropped past max_entries.
+"""
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+MAX_ENTRIES = 1024
+TTL_SECONDS = 60 * 60
+SIMILARITY_THRESHOLD = 0.92
+
+TRAILING_PUNCTUATION = re.compile(r"[\s?!.]+$")
+
+
+def normalize_question(question):
+    """Lower case, unicode and whitespace normalized question without trailing punctuation"""
+    text = " ".join(unicodedata.normalize("NFKC", question).lower().split())
+    return TRAILING_PUNCTUATION.sub("", text)
+
+
+def context_key(parts):
+    """Hash of the context an answer was generated from: chunk ids, or the context text itself"""
+    if isinstance(parts, str):
+        parts = [parts]
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """In-memory answer cache with an exact and a semantic tier.
+       get() and get_similar() return the cached answer or None; put() stores an
+       answer together with the question embedding when there is one. Thread
+       safe, gradio calls the chat function from worker threads
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, similarity_threshold=SIMILARITY_THRESHOLD,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.clock = clock
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.exact_misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        # (normalized question, context key) -> (answer, unit embedding or None, stored at)
+        self._entries = OrderedDict()
+
+    def get(self, question, context):
+        """Exact tier: the answer to the same normalized question asked against the same context key"""
+        key = (normalize_question(question), context)
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.exact_misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[0]
+
+    def get_similar(self, question, context, embedding):
+        """Semantic tier, tried after an exact miss: the answer to the most similar
+           cached question for the same context key, if it is above the threshold
+        """
+        vector = _unit(embedding)
+        with self._lock:
+            keys = [key for key, entry in self._entries.items()
+                    if key[1] == context and entry[1] is not None and entry[1].shape == vector.shape]
+            if not keys:
+                return None
+            similarities = np.stack([self._entries[key][1] for key in keys]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                return None
+            self._entries.move_to_end(keys[best])
+            self.semantic_hits += 1
+            return self._entries[keys[best]][0]
+
+    def put(self, question, context, answer, embedding=None):
+        key = (normalize_question(question), context)
+        vector = _unit(embedding) if embedding is not None else None
+        with self._lock:
+            self._entries[key] = (answer, vector, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _expire(self):
+        # entries are in least recently used order, not insertion order, so check them all
+        deadline = self.clock() - self.ttl
+        expired = [key for key, entry in self._entries.items() if entry[2] < deadline]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters per tier and the current number of entries"""
+        lookups = self.exact_hits + self.exact_misses
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": lookups - hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
@@ -0,0 +1,9 @@
+import os
+
+
+def write_atomic(path, data):
+    """Write bytes to a temporary file and move it into place, so readers never see a half written file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,80 @@
+"""Answer cache hit rate and latency of rag_from_vectordb.get_response.
+
+Replays a chat workload where popular questions come back, sometimes with
+different case, spacing or punctuation, and reports the time per answer and
+the answer cache counters. With --no-cache every question runs a completion.
+
+By default the service talks to the local stub server, whose embeddings are
+random, so paraphrases never hit the semantic tier; pass --real to use the
+configured API (needs GOOGLE_API_KEY) and see semantic hits as well.
+
+Run from the repo root:  python benchmarks/bench_answer_cache.py
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import rag_from_vectordb
+from benchmarks.stub_openai_server import start_stub_server
+
+QUESTIONS = [
+    "Who is the CTO of HERE AND NOW AI?",
+    "Who is the chief technology officer of the company?",
+    "Which courses do you offer?",
+    "What courses are offered?",
+    "What is the vision of the institute?",
+    "Where is HERE AND NOW AI located?",
+    "What is the grand total of invoice INV-102?",
+    "Who was invoice INV-102 billed to?",
+]
+VARIANTS = [str, str.lower, str.upper, lambda text: text.rstrip("?") + " ?", lambda text: "  " + text]
+
+
+def workload(count, seed=0):
+    """Questions drawn with a skewed popularity, each asked in a random variant"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(QUESTIONS))]
+    return [rng.choice(VARIANTS)(rng.choices(QUESTIONS, weights)[0]) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--real", action="store_true", help="use the configured API instead of the stub")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub server seconds per request")
+    parser.add_argument("--no-cache", action="store_true", help="disable the answer cache for comparison")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    settings = {"store_dir": os.path.join(workdir, "faiss_store"),
+                "cache_path": os.path.join(workdir, "embeddings.sqlite3")}
+    if not args.real:
+        server = start_stub_server(latency=args.latency)
+        settings.update(base_url=server.base_url, api_key="stub")
+    service = rag_from_vectordb.RagService(**settings).warmup()
+    if args.no_cache:
+        service.answer_cache.max_entries = 0
+
+    latencies = []
+    for question in workload(args.questions):
+        start = time.perf_counter()
+        for _ in service.get_response(question, []):
+            pass
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+
+    print(f"{args.questions} questions, {len(QUESTIONS)} distinct, answer cache {'off' if args.no_cache else 'on'}")
+    print(f"total {latencies.sum() / 1000:.2f} s, p50 {np.percentile(latencies, 50):.1f} ms, "
+          f"p99 {np.percentile(latencies, 99):.1f} ms")
+    print(service.answer_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Chunking throughput on a large text: the original split_text_semanticaly vs chunking.chunk_text.
+
+Run from the repo root:  python benchmarks/bench_chunking.py --mb 10
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import chunk_text, count_regex_tokens
+
+
+def split_text_semanticaly(text, chunk_size=1000):
+    """The chunker rag_from_vectordb used before chunking.py, kept verbatim as the baseline"""
+    sentences = re.split(r'(?<=[.!?])\s+', text)
+    chunks = []
+    current_chunk = ""
+
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) <= chunk_size:
+            current_chunk += sentence + " "
+        else:
+            chunks.append(current_chunk.strip())
+            current_chunk = sentence + " "
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+
+    return chunks
+
+
+def make_text(size, seed=0):
+    rng = random.Random(seed)
+    words = ["invoice", "total", "amount", "customer", "HERE", "AND", "NOW", "AI", "training",
+             "python", "generative", "model", "retrieval", "the", "of", "and", "to", "in", "2025"]
+    parts = []
+    length = 0
+    while length < size:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(5, 30))).capitalize()
+        sentence += rng.choice([". ", "! ", "? ", ".\n\n"])
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=float, default=10)
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument("--overlap", type=int, default=32)
+    args = parser.parse_args()
+
+    text = make_text(int(args.mb * 1024 * 1024))
+    print(f"text: {len(text) / 1024 / 1024:.1f} MB")
+
+    old, old_time = timed(lambda: split_text_semanticaly(text, 1000))
+    new, new_time = timed(lambda: chunk_text(text, args.max_tokens, args.overlap))
+    tokens = [count_regex_tokens(text[start:end]) for start, end in new[:1000]]
+
+    print(f"split_text_semanticaly: {old_time:6.2f}s  {len(text) / 1e6 / old_time:6.1f} MB/s  {len(old)} chunks")
+    print(f"chunk_text            : {new_time:6.2f}s  {len(text) / 1e6 / new_time:6.1f} MB/s  {len(new)} chunks, "
+          f"max {max(tokens)} tokens, overlap {args.overlap} tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Throughput of web_crawler against a local static site.
+
+Generates a site of --pages HTML pages that link to each other (with
+fragment and query variants of the same links, a robots.txt that disallows
+/private/ and a few pages there), serves it from a local static file server
+that sleeps --latency seconds per request, and compares
+    - a sequential crawl with requests and BeautifulSoup's html.parser,
+      the way rag_from_web fetched its single page
+    - web_crawler.crawl at several concurrency levels
+    - web_crawler.crawl_to_store into a FaissStore, embedding with the
+      local stub server
+
+Run from the repo root:  python benchmarks/bench_crawler.py
+"""
+import argparse
+import asyncio
+import functools
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from bs4 import BeautifulSoup
+
+from benchmarks.stub_openai_server import start_stub_server
+from embedding_utils import embed_texts
+from faiss_store import FaissStore
+from web_crawler import canonical_url, crawl, crawl_to_store
+
+WORDS = ("retrieval augmented generation index vector chunk embedding invoice course vision mission "
+         "student workshop python model context answer question page site crawler").split()
+
+
+def generate_site(root, pages, seed=0):
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(root, "docs"))
+    os.makedirs(os.path.join(root, "private"))
+    with open(os.path.join(root, "robots.txt"), "w") as f:
+        f.write("User-agent: *\nDisallow: /private/\n")
+    names = ["index.html"] + [f"docs/page{number}.html" for number in range(1, pages)]
+    for number, name in enumerate(names):
+        links = [rng.choice(names) for _ in range(6)]
+        anchors = "".join(f'<a href="/{link}">{link}</a> <a href="/{link}#top">top</a> <a href="/{link}?b=2&a=1">q</a> '
+                          f'<a href="/{link}?a=1&b=2">q</a> ' for link in links)
+        anchors += f'<a href="/private/secret{number % 5}.html">private</a> <a href="https://example.com/">external</a>'
+        paragraphs = "".join(f"<p>{' '.join(rng.choices(WORDS, k=80))}.</p>" for _ in range(5))
+        with open(os.path.join(root, name), "w") as f:
+            f.write(f"<html><head><title>Page {number}</title><style>p {{color: red}}</style></head>"
+                    f"<body><h1>Page {number}</h1>{paragraphs}<nav>{anchors}</nav>"
+                    f"<script>var x = 1;</script></body></html>")
+    for number in range(5):
+        with open(os.path.join(root, f"private/secret{number}.html"), "w") as f:
+            f.write("<html><body>secret</body></html>")
+
+
+class SiteServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # the default backlog of 5 resets connections from a concurrent crawler
+    request_queue_size = 256
+
+
+class SlowHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        super().do_GET()
+
+
+def start_site_server(root, latency):
+    server = SiteServer(("127.0.0.1", 0), functools.partial(SlowHandler, directory=root))
+    server.latency = latency
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def sequential_crawl(start_url, max_pages):
+    """Breadth first, one request at a time, html.parser, no robots"""
+    session = requests.Session()
+    seen = {canonical_url(start_url)}
+    queue = deque(seen)
+    pages = 0
+    while queue and pages < max_pages:
+        url = queue.popleft()
+        response = session.get(url, timeout=10)
+        if response.status_code != 200:
+            continue
+        soup = BeautifulSoup(response.content, "html.parser")
+        soup.body.get_text(separator="\n", strip=True)
+        pages += 1
+        for anchor in soup.find_all("a", href=True):
+            link = canonical_url(anchor["href"], url)
+            if urlsplit(link).netloc == urlsplit(start_url).netloc and link not in seen:
+                seen.add(link)
+                queue.append(link)
+    return pages
+
+
+async def concurrent_crawl(start_url, max_pages, concurrency):
+    pages = []
+    async for page in crawl(start_url, max_pages=max_pages, max_depth=100, concurrency=concurrency,
+                            per_host=concurrency):
+        pages.append(page)
+    return pages
+
+
+def report(label, pages, seconds):
+    print(f"{label:34} {pages:6} {seconds:8.2f} {pages / seconds:10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02, help="site server seconds per request")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16, 32])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    site_dir = os.path.join(workdir, "site")
+    generate_site(site_dir, args.pages)
+    start_url = start_site_server(site_dir, args.latency)
+    print(f"{args.pages} pages, {args.latency * 1000:.0f} ms per request")
+    print(f"{'':34} {'pages':>6} {'seconds':>8} {'pages/s':>10}")
+
+    start = time.perf_counter()
+    pages = sequential_crawl(start_url, args.pages)
+    report("sequential requests + html.parser", pages, time.perf_counter() - start)
+
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        pages = asyncio.run(concurrent_crawl(start_url, args.pages, concurrency))
+        report(f"crawl, concurrency {concurrency}", len(pages), time.perf_counter() - start)
+        assert not any("/private/" in page.url for page in pages), "robots.txt was not respected"
+        assert len({page.url for page in pages}) == len(pages), "a page was crawled twice"
+
+    embedding_server = start_stub_server(latency=args.latency)
+    from openai import OpenAI
+    client = OpenAI(base_url=embedding_server.base_url, api_key="stub")
+    store = FaissStore(os.path.join(workdir, "faiss_store"))
+    start = time.perf_counter()
+    pages = asyncio.run(crawl_to_store(start_url, store, lambda texts: embed_texts(client, texts),
+                                       os.path.join(workdir, "pages"), max_pages=args.pages, max_depth=100,
+                                       concurrency=max(args.concurrency)))
+    report(f"crawl_to_store, {len(store.live_ids())} chunks", pages, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
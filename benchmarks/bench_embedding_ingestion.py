@@ -0,0 +1,46 @@
+"""Serial vs batched embedding ingestion against the local stub server.
+
+Run from the repo root:  python benchmarks/bench_embedding_ingestion.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openai import OpenAI
+
+from benchmarks.stub_openai_server import start_stub_server
+from embedding_utils import embed_texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency)
+    client = OpenAI(api_key="stub", base_url=server.base_url)
+    chunks = [f"chunk {i} " + "lorem ipsum dolor sit amet " * 40 for i in range(args.chunks)]
+
+    start = time.perf_counter()
+    serial = [client.embeddings.create(input=chunk, model="stub").data[0].embedding for chunk in chunks]
+    serial_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batched = embed_texts(client, chunks, model="stub", batch_size=args.batch_size, max_workers=args.workers)
+    batched_time = time.perf_counter() - start
+
+    assert batched.shape == (len(serial), len(serial[0]))
+    print(f"serial : {len(chunks) / serial_time:10.1f} chunks/s ({serial_time:.2f}s)")
+    print(f"batched: {len(chunks) / batched_time:10.1f} chunks/s ({batched_time:.2f}s, "
+          f"batch_size={args.batch_size}, workers={args.workers})")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Cold start vs restart cost of fetching, parsing and chunking through http_cache.
+
+Serves the bundled PDFs from a local static file server, which answers
+If-Modified-Since with 304, and loads every PDF the way rag_from_pdf does:
+fetch, extract the text and chunk it into passages. The first pass starts
+from an empty cache; every later pass is a restart with a fresh HttpCache
+and session over the same cache directory.
+
+Run from the repo root:  python benchmarks/bench_http_cache.py
+"""
+import argparse
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from context_budget import passage_spans
+from http_cache import HttpCache
+from pdf_reader import read_pdf
+from rag_from_vectordb import source_pdf_paths
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class CountingHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def send_response(self, code, message=None):
+        self.server.statuses.append(code)
+        super().send_response(code, message)
+
+
+def load_all(cache_dir, urls):
+    cache = HttpCache(cache_dir)
+    for url in urls:
+        response = cache.fetch(url)
+        text = cache.artifact(response, "text", lambda: read_pdf(response.path))
+        cache.artifact(response, "passages", lambda: passage_spans(text))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--restarts", type=int, default=3)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(CountingHandler, directory=REPO_DIR))
+    server.statuses = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/"
+    urls = [base + os.path.relpath(path, REPO_DIR).replace(os.sep, "/") for path in source_pdf_paths()]
+    cache_dir = tempfile.mkdtemp()
+
+    print(f"{len(urls)} pdfs")
+    for run in range(args.restarts + 1):
+        server.statuses.clear()
+        start = time.perf_counter()
+        load_all(cache_dir, urls)
+        elapsed = time.perf_counter() - start
+        label = "cold start" if run == 0 else f"restart {run}"
+        print(f"{label:12} {elapsed * 1000:8.1f} ms  responses: "
+              f"{server.statuses.count(200)} x 200, {server.statuses.count(304)} x 304")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Payload size and batch throughput of rag_from_image.
+
+Generates --images synthetic 12 megapixel phone photos (JPEG with EXIF) and
+reports the upload payload of the raw file vs the preprocessed image, then
+describes the directory against the local stub server with one worker,
+with --workers workers, and once more from the answer cache.
+
+Run from the repo root:  python benchmarks/bench_image_batch.py
+"""
+import argparse
+import base64
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from openai import OpenAI
+from PIL import Image
+
+# rag_from_image creates its client at import, the stub client replaces it below
+os.environ.setdefault("GOOGLE_API_KEY", "stub")
+import rag_from_image
+from benchmarks.stub_openai_server import start_stub_server
+from image_preprocessing import prepare_image
+
+
+def generate_photos(directory, count, seed=0):
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:3024, 0:4032]
+    for number in range(count):
+        # smooth gradients plus sensor noise compress roughly like a real photo
+        base = np.stack([(x * (number + 1)) % 256, (y * 2) % 256, (x + y) % 256], axis=-1)
+        noise = rng.normal(0, 12, base.shape)
+        pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+        exif = Image.Exif()
+        exif[0x010F] = "PhoneMaker"
+        exif[0x0112] = 1
+        Image.fromarray(pixels).save(os.path.join(directory, f"photo{number}.jpg"), quality=92, exif=exif)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=12)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub server seconds per request")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    image_dir = os.path.join(workdir, "images")
+    os.makedirs(image_dir)
+    generate_photos(image_dir, args.images)
+    paths = sorted(os.path.join(image_dir, name) for name in os.listdir(image_dir))
+
+    raw = sum(len(base64.b64encode(open(path, "rb").read())) for path in paths)
+    start = time.perf_counter()
+    prepared = sum(len(base64.b64encode(prepare_image(path, rag_from_image.max_image_dimension,
+                                                      rag_from_image.image_quality)[1])) for path in paths)
+    prepare_ms = (time.perf_counter() - start) * 1000 / len(paths)
+    print(f"{len(paths)} photos 4032x3024")
+    print(f"payload per image: raw {raw / len(paths) / 1e6:.2f} MB, preprocessed {prepared / len(paths) / 1e6:.2f} MB "
+          f"({prepare_ms:.0f} ms to preprocess)")
+
+    server = start_stub_server(latency=args.latency)
+    rag_from_image.client = OpenAI(base_url=server.base_url, api_key="stub")
+    for label, workers, cache_dir in (("1 worker", 1, os.path.join(workdir, "cache1")),
+                                      (f"{args.workers} workers", args.workers, os.path.join(workdir, "cache")),
+                                      ("cached rerun", args.workers, os.path.join(workdir, "cache"))):
+        rag_from_image.answer_cache_dir = cache_dir
+        server.request_count = 0
+        start = time.perf_counter()
+        rag_from_image.describe_directory(image_dir, workers)
+        print(f"{label:14} {time.perf_counter() - start:7.2f} s  {server.request_count} requests")
+
+
+if __name__ == "__main__":
+    main()
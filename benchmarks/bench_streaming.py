@@ -0,0 +1,74 @@
+"""Time to first token vs time to the full answer, blocking and streamed.
+
+For rag_from_vectordb and rag_from_web, asks distinct questions (so the
+answer cache never hits) against the local stub server, which generates
+the answer at --token-latency seconds per word. The blocking row is one
+chat completion without stream=True, where nothing can be shown until the
+whole answer is there; the streamed row is get_response, timed at its
+first and last yield.
+
+Run from the repo root:  python benchmarks/bench_streaming.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import rag_from_vectordb
+import rag_from_web
+from benchmarks.stub_openai_server import start_stub_server
+
+
+def time_blocking(client, model, question):
+    start = time.perf_counter()
+    client.chat.completions.create(model=model, messages=[{"role": "user", "content": question}])
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def time_streamed(service, question):
+    start = time.perf_counter()
+    first = None
+    for _ in service.get_response(question, []):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def report(title, rows):
+    first, full = np.array(rows).T * 1000
+    print(f"{title:26} {np.percentile(first, 50):10.1f} {np.percentile(full, 50):10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub server seconds per request")
+    parser.add_argument("--token-latency", type=float, default=0.03, help="stub server seconds per generated word")
+    args = parser.parse_args()
+
+    server = start_stub_server(latency=args.latency, token_latency=args.token_latency)
+    workdir = tempfile.mkdtemp()
+    vectordb_service = rag_from_vectordb.RagService(
+        base_url=server.base_url, api_key="stub",
+        store_dir=os.path.join(workdir, "faiss_store"), cache_path=os.path.join(workdir, "embeddings.sqlite3")).warmup()
+    web_service = rag_from_web.WebRagService(url=server.base_url.replace("/v1/", "/page"),
+                                             base_url=server.base_url,
+                                             http_cache_dir=os.path.join(workdir, "http")).warmup()
+    questions = [f"Question {number}: who is the CTO of HERE AND NOW AI?" for number in range(args.questions)]
+
+    print(f"p50 over {args.questions} questions, {args.token_latency * 1000:.0f} ms per word")
+    print(f"{'':26} {'first ms':>10} {'full ms':>10}")
+    report("blocking completion", [time_blocking(vectordb_service.client, "gemini-2.5-flash", question)
+                                   for question in questions])
+    report("rag_from_vectordb stream", [time_streamed(vectordb_service, question) for question in questions])
+    report("rag_from_web stream", [time_streamed(web_service, question) for question in questions])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Recall@k and query latency of the approximate index types against the exact Flat index.
+
+Uses the vectors of an existing store (--store faiss_store) or a synthetic
+clustered corpus (--synthetic N). Queries are stored vectors with a little
+noise added, so every query has true neighbours in the corpus.
+
+Every index type that supports removal is also checked the way sync()
+uses it: --removed ids are removed, then stored vectors that are left are
+searched and must find their own id ("remove ok" is the fraction that do).
+Every index type is also put through FaissStore.sync: a store is built over
+the first --sync-vectors vectors, then a new source with --added more is
+synced, which adds them to the existing index without a rebuild ("add ok"
+is the fraction of the added vectors that find their own id).
+
+Run from the repo root:  python benchmarks/eval_ann_index.py --synthetic 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import faiss
+import numpy as np
+
+from faiss_store import DEFAULT_INDEX_OPTIONS, FaissStore, build_index, set_search_params
+
+
+def synthetic_corpus(n, dim, clusters=200, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_queries(vectors, count, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), count)] + 0.1 * rng.standard_normal(
+        (count, vectors.shape[1])).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def evaluate(index, queries, truth, k):
+    latencies = []
+    found = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+        found.append(ids[0])
+    recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+    latencies = np.array(latencies) * 1000
+    return recall, np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def check_removal(index, vectors, ids, removed, count=200, seed=2):
+    """Remove the first `removed` ids from a copy of index, then search stored
+       vectors that are left; returns the fraction that find their own id in the top 10
+    """
+    index = faiss.clone_index(index)
+    index.remove_ids(ids[:removed])
+    picks = np.random.default_rng(seed).integers(removed, len(ids), count)
+    _, found = index.search(np.ascontiguousarray(vectors[picks]), 10)
+    return np.mean([chunk_id in row for chunk_id, row in zip(ids[picks], found)])
+
+
+def check_sync(vectors, options, initial, added, count=200, seed=3):
+    """Sync a store over vectors[:initial], then sync a second source with the next
+       `added` vectors. Returns the fraction of the added vectors that find their own
+       id in the top 10, or None when the second sync rebuilt the index
+    """
+    with tempfile.TemporaryDirectory() as store_dir:
+        sources = []
+        for name, rows in (("initial", range(initial)), ("added", range(initial, initial + added))):
+            sources.append(os.path.join(store_dir, name + ".txt"))
+            with open(sources[-1], "w") as f:
+                f.write(" ".join(map(str, rows)))
+
+        def read_chunks(path):
+            with open(path) as f:
+                return f.read().split()
+
+        def embed(texts):
+            return vectors[[int(text) for text in texts]]
+
+        store = FaissStore(os.path.join(store_dir, "store"), **options)
+        store.sync(sources[:1], read_chunks, embed)
+        trained_on = store.manifest["index"]["trained_on"]
+        store.sync(sources, read_chunks, embed)
+        if store.manifest["index"]["trained_on"] != trained_on:
+            return None
+        picks = np.random.default_rng(seed).integers(initial, initial + added, count)
+        _, found = store.index.search(np.ascontiguousarray(vectors[picks]), 10)
+        return np.mean([chunk_id in row for chunk_id, row in zip(picks, found)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", help="store directory to take the vectors from")
+    parser.add_argument("--synthetic", type=int, default=50000, help="size of the synthetic corpus")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=DEFAULT_INDEX_OPTIONS["nlist"])
+    parser.add_argument("--pq-m", type=int, default=DEFAULT_INDEX_OPTIONS["pq_m"])
+    parser.add_argument("--hnsw-m", type=int, default=DEFAULT_INDEX_OPTIONS["hnsw_m"])
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--removed", type=int, default=50, help="ids removed before the removal check")
+    parser.add_argument("--sync-vectors", type=int, default=10000, help="vectors in the store before the add check")
+    parser.add_argument("--added", type=int, default=500, help="vectors added by the add check")
+    args = parser.parse_args()
+
+    if args.store:
+        store = FaissStore(args.store)
+        ids = store.live_ids()
+        vectors = np.ascontiguousarray(store.vectors[ids])
+    else:
+        vectors = synthetic_corpus(args.synthetic, args.dim)
+        ids = np.arange(len(vectors), dtype=np.int64)
+    queries = make_queries(vectors, args.queries)
+    print(f"corpus: {len(vectors)} vectors of dim {vectors.shape[1]}, {len(queries)} queries, k={args.k}")
+
+    base = {**DEFAULT_INDEX_OPTIONS, "nlist": args.nlist, "pq_m": args.pq_m, "hnsw_m": args.hnsw_m}
+    flat, _ = build_index(vectors, ids, {**base, "index_type": "flat"})
+    _, truth = flat.search(queries, args.k)
+
+    runs = [("flat", {})]
+    runs += [(kind, {"nprobe": nprobe}) for kind in ("ivf_flat", "ivf_pq") for nprobe in args.nprobe]
+    runs += [("hnsw", {"ef_search": ef}) for ef in args.ef_search]
+
+    print(f"{'index':10} {'params':16} {'build s':>8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'remove ok':>9} {'add ok':>7}")
+    initial = min(args.sync_vectors, len(vectors) - args.added)
+    built = {}
+    added = {}
+    for kind, search_params in runs:
+        options = {**base, "index_type": kind, **search_params}
+        if kind not in built:
+            start = time.perf_counter()
+            built[kind] = build_index(vectors, ids, options) + (time.perf_counter() - start,)
+        index, built_as, build_time = built[kind]
+        if built_as != kind:
+            print(f"{kind:10} skipped, corpus too small to train it")
+            continue
+        set_search_params(index, options)
+        recall, p50, p99 = evaluate(index, queries, truth, args.k)
+        # HNSW graphs do not support removal, the store rebuilds them instead
+        removal = "-" if kind == "hnsw" else f"{check_removal(index, vectors, ids, args.removed):.3f}"
+        if kind not in added:
+            add_ok = check_sync(vectors, options, initial, args.added)
+            added[kind] = "rebuilt" if add_ok is None else f"{add_ok:.3f}"
+        params = ", ".join(f"{name}={value}" for name, value in search_params.items())
+        print(f"{kind:10} {params:16} {build_time:8.2f} {recall:9.3f} {p50:8.3f} {p99:8.3f} {removal:>9} {added[kind]:>7}")
+
+
+if __name__ == "__main__":
+    main()
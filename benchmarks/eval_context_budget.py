@@ -0,0 +1,52 @@
+"""Prompt tokens per question with the whole document vs budgeted passages.
+
+The document is the text of profile-of-hereandnowai.pdf and PDFs/*.pdf
+joined together, the way rag_from_pdf and rag_from_web used to put a whole
+document into every prompt. For each question the context selected by
+context_budget.ContextIndex is checked for the text that answers it, so the
+token savings can be weighed against answers that would be lost.
+
+Run from the repo root:  python benchmarks/eval_context_budget.py
+"""
+import argparse
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.eval_retrieval_modes import build_questions
+from context_budget import ContextIndex
+from pdf_reader import read_pdf
+from rag_from_vectordb import source_pdf_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--per-query", action="store_true", help="print the tokens of every question")
+    args = parser.parse_args()
+
+    paths = source_pdf_paths()
+    document = "\n".join(read_pdf(path) for path in paths)
+    questions = build_questions(paths)
+    print(f"{len(paths)} pdfs, {len(questions)} questions")
+    print(f"{'budget':>7} {'tokens before':>14} {'tokens after':>13} {'saved':>7} {'answer kept':>12}")
+
+    for budget in args.budgets:
+        index = ContextIndex(document)
+        kept = 0
+        for question, expected in questions:
+            _, context = index.select(question, budget)
+            found = bool(re.search(expected, context))
+            kept += found
+            if args.per_query:
+                print(f"    {index.document_tokens:6} -> {index.count_tokens(context):5}  "
+                      f"{'kept' if found else 'LOST'}  {question}")
+        stats = index.stats()
+        print(f"{budget:7} {stats['tokens_before']:14} {stats['tokens_after']:13.0f} {stats['saved']:7.1%} "
+              f"{kept / len(questions):12.1%}")
+
+
+if __name__ == "__main__":
+    main()
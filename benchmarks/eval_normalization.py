@@ -0,0 +1,116 @@
+"""Ranking quality of the old and new normalization, and of the compressed vector storage.
+
+The reference ranking is exact cosine similarity computed in float64. The
+old pipeline divided every dimension by its norm across the corpus
+(np.linalg.norm(axis=0)) and searched with unnormalized queries; the new
+one normalizes every stored vector and query to unit length.
+
+The compressed storage is also measured through a FaissStore that grows
+incrementally: a first sync of 3 vectors, then the rest of the corpus, so
+an int8 quantizer trained on the first sync only would show up here.
+
+Exits with status 1 if the new float32 pipeline does not reproduce the
+cosine ranking, so it can be run as a regression check.
+
+Run from the repo root:  python benchmarks/eval_normalization.py
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import shutil
+import tempfile
+
+import faiss
+import numpy as np
+
+from faiss_store import DEFAULT_INDEX_OPTIONS, FaissStore, build_index, normalize_queries
+
+
+def embedding_like_corpus(n, dim, seed=0):
+    """Clustered vectors with uneven norms and per-dimension scales, like real embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((100, dim))
+    vectors = centers[rng.integers(0, 100, n)] + 0.6 * rng.standard_normal((n, dim))
+    vectors *= rng.uniform(0.2, 3.0, dim)
+    vectors *= rng.uniform(0.5, 2.0, (n, 1))
+    return vectors.astype(np.float32)
+
+
+def recall_at_k(found, truth, k):
+    return np.mean([len(set(f[:k]) & set(t[:k])) / k for f, t in zip(found, truth)])
+
+
+def grown_store_recall(vectors, queries, truth, k, storage, first=3):
+    """Recall of a store filled by two syncs, `first` vectors and then all of them"""
+    store_dir = tempfile.mkdtemp()
+    source_dir = tempfile.mkdtemp()
+    try:
+        sources = {os.path.join(source_dir, "first.txt"): range(first),
+                   os.path.join(source_dir, "rest.txt"): range(first, len(vectors))}
+        for path in sources:
+            with open(path, "w") as f:
+                f.write(path)
+
+        def read_chunks(path):
+            return [str(row) for row in sources[path]]
+
+        def embed(texts):
+            return vectors[[int(text) for text in texts]]
+
+        store = FaissStore(store_dir, vector_storage=storage)
+        paths = list(sources)
+        store.sync(paths[:1], read_chunks, embed)
+        store.sync(paths, read_chunks, embed)
+        found = [[chunk_id for _, chunk_id, _ in hits] for hits in store.search(queries, k)]
+        return recall_at_k(found, truth, k)
+    finally:
+        shutil.rmtree(store_dir)
+        shutil.rmtree(source_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = embedding_like_corpus(args.corpus, args.dim)
+    queries = embedding_like_corpus(args.queries, args.dim, seed=1)
+    ids = np.arange(len(vectors), dtype=np.int64)
+
+    unit = vectors / np.linalg.norm(vectors.astype(np.float64), axis=1, keepdims=True)
+    unit_queries = queries / np.linalg.norm(queries.astype(np.float64), axis=1, keepdims=True)
+    truth = np.argsort(-(unit_queries @ unit.T), axis=1)[:, :args.k]
+
+    old = vectors / np.linalg.norm(vectors, axis=0, keepdims=True)
+    old_index = faiss.IndexFlatIP(args.dim)
+    old_index.add(old)
+    _, old_found = old_index.search(queries, args.k)
+
+    print(f"{'pipeline':28} {'recall@k':>9} {'index bytes':>12}")
+    print(f"{'old (per-dimension norm)':28} {recall_at_k(old_found, truth, args.k):9.3f} "
+          f"{faiss.serialize_index(old_index).nbytes:12d}")
+
+    stored = vectors.copy()
+    faiss.normalize_L2(stored)
+    results = {}
+    for storage in ("float32", "float16", "int8"):
+        index, _ = build_index(stored, ids, {**DEFAULT_INDEX_OPTIONS, "vector_storage": storage})
+        _, found = index.search(normalize_queries(queries), args.k)
+        results[storage] = recall_at_k(found, truth, args.k)
+        print(f"{'new, ' + storage:28} {results[storage]:9.3f} {faiss.serialize_index(index).nbytes:12d}")
+    for storage in ("float16", "int8"):
+        print(f"{'new, ' + storage + ', grown store':28} {grown_store_recall(vectors, queries, truth, args.k, storage):9.3f}")
+
+    if results["float32"] < 0.99:
+        print("FAIL: normalized float32 search does not match the cosine ranking")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
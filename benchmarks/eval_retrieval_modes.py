@@ -0,0 +1,89 @@
+"""Recall and latency of the vector, lexical and hybrid retrieval modes on the bundled PDFs.
+
+Indexes profile-of-hereandnowai.pdf and PDFs/*.pdf into a temporary store
+and asks questions whose answer is known to sit in a specific chunk: the
+invoice number and customer of every invoice plus a few profile questions.
+A hit means a chunk containing the expected text is among the top k.
+
+By default embeddings come from the local stub server, whose vectors are
+random, so only the lexical numbers and the latencies are meaningful;
+pass --real to embed with the configured API (needs GOOGLE_API_KEY).
+
+Run from the repo root:  python benchmarks/eval_retrieval_modes.py
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+import rag_from_vectordb
+from benchmarks.stub_openai_server import start_stub_server
+from pdf_reader import read_pdf
+
+PROFILE_QUESTIONS = [
+    ("Who is the CTO of HERE AND NOW AI?", r"CTO"),
+    ("Who is the chief executive officer?", r"CEO"),
+    ("Which courses do you offer?", r"Courses We Offer"),
+    ("What is the vision of the institute?", r"Vision"),
+]
+
+
+def build_questions(paths):
+    """Return (question, regex that a relevant chunk matches) pairs"""
+    questions = list(PROFILE_QUESTIONS)
+    for path in paths:
+        text = read_pdf(path)
+        number = re.search(r"Invoice No:\s*(\S+)", text)
+        customer = re.search(r"Bill To:\s*(.+)", text)
+        if number:
+            questions.append((f"What is the grand total of invoice {number.group(1)}?",
+                              rf"Invoice No:\s*{re.escape(number.group(1))}\b"))
+        if customer:
+            name = customer.group(1).strip()
+            questions.append((f"Which invoice was billed to {name}?", rf"Bill To:\s*{re.escape(name)}"))
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--real", action="store_true", help="embed with the configured API instead of the stub")
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=5, help="timed passes over the question set")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    settings = {"store_dir": os.path.join(workdir, "faiss_store"),
+                "cache_path": os.path.join(workdir, "embeddings.sqlite3")}
+    if not args.real:
+        server = start_stub_server(latency=0.0)
+        settings.update(base_url=server.base_url, api_key="stub")
+    service = rag_from_vectordb.RagService(**settings).warmup()
+
+    questions = build_questions(rag_from_vectordb.source_pdf_paths())
+    print(f"{len(service.store.live_ids())} chunks, {len(questions)} questions, k={args.k}"
+          + ("" if args.real else "  (stub embeddings: vector recall is not meaningful)"))
+    print(f"{'mode':8} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for mode in ("vector", "lexical", "hybrid"):
+        hits = 0
+        latencies = []
+        for attempt in range(args.repeat):
+            for question, expected in questions:
+                start = time.perf_counter()
+                results = service.search_many([question], args.k, mode)[0]
+                latencies.append(time.perf_counter() - start)
+                if attempt == 0:
+                    hits += any(re.search(expected, text) for _, _, text in results)
+        latencies = np.array(latencies) * 1000
+        print(f"{mode:8} {hits / len(questions):9.3f} {np.percentile(latencies, 50):8.3f} "
+              f"{np.percentile(latencies, 99):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
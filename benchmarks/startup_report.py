@@ -0,0 +1,75 @@
+"""Where the startup time of rag_from_vectordb and rag_from_web goes.
+
+Reports the module import time, every warmup stage and the stages of the
+first and second question. By default the services talk to the local stub
+server and use a temporary store and cache, so the report runs offline
+and the first run shows a cold start; pass --real to use the configured
+endpoints, store and cache.
+
+Run from the repo root:  python benchmarks/startup_report.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stub_openai_server import start_stub_server
+from timing import format_timings
+
+
+def timed_import(name):
+    start = time.perf_counter()
+    module = __import__(name)
+    return module, time.perf_counter() - start
+
+
+def report(title, service, question, import_seconds):
+    print(f"== {title}")
+    print(f"{'import module':28} {import_seconds * 1000:9.1f} ms")
+    service.timings.clear()
+    start = time.perf_counter()
+    service.warmup()
+    print(f"-- warmup ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    print(format_timings(service.timings))
+    for label in ("first", "second"):
+        service.timings.clear()
+        start = time.perf_counter()
+        for _ in service.get_response(question, []):
+            pass
+        print(f"-- {label} question ({(time.perf_counter() - start) * 1000:.1f} ms)")
+        print(format_timings(service.timings))
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--real", action="store_true", help="use the real endpoints, store and cache")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub server seconds per request")
+    args = parser.parse_args()
+
+    rag_from_vectordb, vectordb_import = timed_import("rag_from_vectordb")
+    rag_from_web, web_import = timed_import("rag_from_web")
+    question = "Who is the CTO of HERE AND NOW AI?"
+
+    if args.real:
+        vectordb_service = rag_from_vectordb.service
+        web_service = rag_from_web.service
+    else:
+        server = start_stub_server(latency=args.latency)
+        workdir = tempfile.mkdtemp()
+        vectordb_service = rag_from_vectordb.RagService(
+            base_url=server.base_url, api_key="stub",
+            store_dir=os.path.join(workdir, "faiss_store"), cache_path=os.path.join(workdir, "embeddings.sqlite3"))
+        web_service = rag_from_web.WebRagService(url=server.base_url.replace("/v1/", "/page"),
+                                                 base_url=server.base_url,
+                                                 http_cache_dir=os.path.join(workdir, "http"))
+
+    report("rag_from_vectordb", vectordb_service, question, vectordb_import)
+    report("rag_from_web", web_service, question, web_import)
+
+
+if __name__ == "__main__":
+    main()
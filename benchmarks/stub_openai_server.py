@@ -0,0 +1,122 @@
+"""A local stand-in for the OpenAI compatible API, used by the benchmarks.
+
+Embeddings are deterministic pseudo random vectors derived from the text,
+so the same text always gets the same vector. Chat completions answer with
+a fixed sentence, generated at `token_latency` seconds per word and sent
+word by word as server sent events when the request asks for stream=True.
+GET /page returns a small HTML page. Every request sleeps for `latency`
+seconds to mimic the network round trip.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+EMBEDDING_DIM = 768
+ANSWER = "The CTO of HERE AND NOW AI is listed in the company profile."
+ANSWER_TOKENS = re.findall(r"\S+\s*", ANSWER)
+PAGE = b"<html><body><h1>HERE AND NOW AI</h1><p>Designed with passion for innovation.</p></body></html>"
+
+
+def fake_embedding(text, dim=EMBEDDING_DIM):
+    """Return a deterministic unit vector for the text"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        for token in ANSWER_TOKENS:
+            time.sleep(self.server.token_latency)
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self.server.request_count += 1
+        time.sleep(self.server.latency)
+
+        if self.path.endswith("/embeddings"):
+            texts = request["input"]
+            if isinstance(texts, str):
+                texts = [texts]
+            self._send_json({
+                "object": "list",
+                "model": request.get("model", "stub"),
+                "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text).tolist()}
+                         for i, text in enumerate(texts)],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+        elif self.path.endswith("/chat/completions") and request.get("stream"):
+            self._send_stream(request.get("model", "stub"))
+        elif self.path.endswith("/chat/completions"):
+            # a blocking completion takes as long to generate as the streamed one
+            time.sleep(self.server.token_latency * len(ANSWER_TOKENS))
+            self._send_json({
+                "id": "stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": ANSWER}}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def do_GET(self):
+        self.server.request_count += 1
+        time.sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+
+def start_stub_server(latency=0.05, port=0, token_latency=0.0):
+    """Start the stub server in a background thread and return it.
+       The base url for the OpenAI client is server.base_url
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.latency = latency
+    server.token_latency = token_latency
+    server.request_count = 0
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}/v1/"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    server = start_stub_server(port=8765)
+    print(f"Stub OpenAI server running on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,98 @@
+"""In-process BM25 inverted index over chunk texts.
+
+Kept next to the FAISS index so exact terms such as invoice numbers,
+GSTINs and names can be matched without an embedding call. Documents are
+added and removed by chunk id, like the vector index.
+"""
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+# identifiers like INV-102 or 33HNAI0000X1Z5 stay one token, their parts are indexed as well
+TERM = re.compile(r"\w+(?:[-/.]\w+)*")
+SUBTERM = re.compile(r"\w+")
+
+
+def tokenize(text):
+    terms = []
+    for match in TERM.finditer(text.lower()):
+        term = match.group()
+        terms.append(term)
+        if not term.isalnum():
+            terms.extend(SUBTERM.findall(term))
+    return terms
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)   # term -> {doc id: term frequency}
+        self.doc_lengths = {}               # doc id -> number of terms
+        self.total_length = 0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, doc_id, text):
+        terms = tokenize(text)
+        for term, count in Counter(terms).items():
+            self.postings[term][doc_id] = count
+        self.doc_lengths[doc_id] = len(terms)
+        self.total_length += len(terms)
+
+    def remove(self, doc_id, text):
+        """Remove a document, text must be what was added so its postings can be found"""
+        if doc_id not in self.doc_lengths:
+            return
+        for term in set(tokenize(text)):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(self, query, top_k):
+        """Return up to top_k (score, doc id) pairs, best first"""
+        if not self.doc_lengths:
+            return []
+        doc_count = len(self.doc_lengths)
+        average_length = self.total_length / doc_count
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, frequency in docs.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / average_length)
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(score, doc_id) for doc_id, score in best]
+
+    def to_json(self):
+        return json.dumps({"k1": self.k1, "b": self.b, "doc_lengths": self.doc_lengths, "postings": self.postings})
+
+    @classmethod
+    def from_json(cls, data):
+        data = json.loads(data)
+        index = cls(data["k1"], data["b"])
+        # json turns the integer doc ids into strings
+        index.doc_lengths = {int(doc_id): length for doc_id, length in data["doc_lengths"].items()}
+        index.total_length = sum(index.doc_lengths.values())
+        for term, docs in data["postings"].items():
+            index.postings[term] = {int(doc_id): count for doc_id, count in docs.items()}
+        return index
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked lists of ids into one, best first, as [(score, id)].
+       Each list contributes 1 / (k + rank) for every id it contains
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1 / (k + rank)
+    return sorted(((score, doc_id) for doc_id, score in scores.items()), key=lambda item: item[0], reverse=True)
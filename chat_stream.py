@@ -0,0 +1,21 @@
+import time
+
+
+def stream_chat(client, model, messages, timings=None):
+    """Run a streaming chat completion and yield the answer accumulated so far after every token.
+       When a timings dict is given, the time to the first token and to the full
+       answer are added to it, in seconds
+    """
+    start = time.perf_counter()
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True)
+    answer = ""
+    for chunk in stream:
+        # some providers send keep-alive or usage chunks without a text delta
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        if not answer and timings is not None:
+            timings["first token"] = timings.get("first token", 0.0) + time.perf_counter() - start
+        answer += chunk.choices[0].delta.content
+        yield answer
+    if timings is not None:
+        timings["chat completion"] = timings.get("chat completion", 0.0) + time.perf_counter() - start
@@ -0,0 +1,137 @@
+"""Sentence based chunking measured in tokens.
+
+chunk_text returns (start, end) offsets into the source text instead of
+copies of it; chunk_pages does the same work on a stream of page texts and
+yields chunk strings. Both run in time linear in the input length: every
+sentence is tokenized once and the overlap carried between chunks is
+bounded by overlap_tokens.
+
+Token counts come from a pluggable count_tokens(text) -> int callable.
+The default counts words and punctuation marks, which is close to what
+subword tokenizers report for English prose; tiktoken_counter() plugs in a
+real BPE tokenizer when tiktoken is installed.
+"""
+import re
+from collections import deque
+
+MAX_TOKENS = 256
+OVERLAP_TOKENS = 32
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+TOKEN = re.compile(r"\w+|[^\w\s]")
+WORD = re.compile(r"\S+")
+
+
+def count_regex_tokens(text):
+    """Default tokenizer: one token per word or punctuation mark"""
+    return len(TOKEN.findall(text))
+
+
+def tiktoken_counter(encoding_name="cl100k_base"):
+    """Return a count_tokens function backed by tiktoken"""
+    try:
+        import tiktoken
+    except ImportError:
+        raise ImportError("tiktoken is not installed, run: pip install tiktoken")
+    encoding = tiktoken.get_encoding(encoding_name)
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def sentence_spans(text, start=0, end=None):
+    """Yield (start, end) of every sentence in text[start:end], without surrounding whitespace"""
+    end = len(text) if end is None else end
+    for match in SENTENCE_BREAK.finditer(text, start, end):
+        if match.start() > start:
+            yield start, match.start()
+        start = match.end()
+    while start < end and text[start].isspace():
+        start += 1
+    if start < end:
+        yield start, end
+
+
+def _sentence_units(text, spans, max_tokens, count_tokens):
+    """Yield ((start, end), tokens) per sentence, splitting sentences longer than max_tokens at word boundaries"""
+    for start, end in spans:
+        tokens = count_tokens(text[start:end])
+        if tokens <= max_tokens:
+            yield (start, end), tokens
+            continue
+        piece_start = piece_end = None
+        piece_tokens = 0
+        for word in WORD.finditer(text, start, end):
+            word_tokens = count_tokens(word.group())
+            if piece_start is not None and piece_tokens + word_tokens > max_tokens:
+                yield (piece_start, piece_end), piece_tokens
+                piece_start, piece_tokens = None, 0
+            if piece_start is None:
+                piece_start = word.start()
+            piece_end = word.end()
+            piece_tokens += word_tokens
+        if piece_start is not None:
+            yield (piece_start, piece_end), piece_tokens
+
+
+def _group_units(units, max_tokens, overlap_tokens):
+    """Greedily pack (item, tokens) units into groups of at most max_tokens.
+       Each group starts with the trailing units of the previous one, up to overlap_tokens
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError("overlap_tokens must be smaller than max_tokens")
+    window = deque()
+    window_tokens = 0
+    has_new_units = False
+    for item, tokens in units:
+        if has_new_units and window_tokens + tokens > max_tokens:
+            yield [unit for unit, _ in window]
+            overlap = deque()
+            overlap_size = 0
+            while window and overlap_size + window[-1][1] <= overlap_tokens:
+                unit = window.pop()
+                overlap.appendleft(unit)
+                overlap_size += unit[1]
+            window, window_tokens = overlap, overlap_size
+            has_new_units = False
+        while window and window_tokens + tokens > max_tokens:
+            window_tokens -= window.popleft()[1]
+        window.append((item, tokens))
+        window_tokens += tokens
+        has_new_units = True
+    if has_new_units:
+        yield [unit for unit, _ in window]
+
+
+def chunk_text(text, max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS, count_tokens=count_regex_tokens):
+    """Split text into chunks of whole sentences of at most max_tokens tokens.
+       Returns a list of (start, end) offsets, chunk i is text[start:end]
+    """
+    units = _sentence_units(text, sentence_spans(text), max_tokens, count_tokens)
+    return [(group[0][0], group[-1][1]) for group in _group_units(units, max_tokens, overlap_tokens)]
+
+
+def chunk_pages(pages, max_tokens=MAX_TOKENS, overlap_tokens=OVERLAP_TOKENS, count_tokens=count_regex_tokens):
+    """Chunk an iterable of page texts and yield the chunk strings.
+       Only the unfinished last sentence of a page is carried over to the next
+       page, so memory is bounded by the page and chunk size, not the document
+    """
+    def units():
+        carry = ""
+        for page in pages:
+            text = carry + "\n" + page if carry else page
+            spans = list(sentence_spans(text))
+            carry = ""
+            if spans and spans[-1][1] == len(text) and text[-1] not in ".!?":
+                # the page may end mid sentence, unless that sentence is already too long to wait for
+                start, end = spans.pop()
+                if count_tokens(text[start:end]) <= max_tokens:
+                    carry = text[start:end]
+                else:
+                    spans.append((start, end))
+            for (start, end), tokens in _sentence_units(text, spans, max_tokens, count_tokens):
+                yield text[start:end], tokens
+        if carry:
+            yield from ((carry[start:end], tokens)
+                        for (start, end), tokens in _sentence_units(carry, [(0, len(carry))], max_tokens, count_tokens))
+
+    for group in _group_units(units(), max_tokens, overlap_tokens):
+        yield " ".join(group)
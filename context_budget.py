@@ -0,0 +1,82 @@
+"""Pick the passages of a document that fit a prompt token budget.
+
+A ContextIndex is built once per document: the text is split into
+sentence chunks and the chunks go into a BM25 index. For every question
+select() takes the best matching chunks until the budget is used up and
+returns them in document order, with overlapping chunks merged so no text
+is sent twice. Questions without any matching term get the start of the
+document, which is where profiles and pages state what they are about.
+"""
+from bm25 import BM25Index
+from chunking import chunk_text, count_regex_tokens
+
+CONTEXT_TOKEN_BUDGET = 1024
+PASSAGE_TOKENS = 128
+PASSAGE_OVERLAP_TOKENS = 16
+
+
+def passage_spans(text, max_tokens=PASSAGE_TOKENS, overlap_tokens=PASSAGE_OVERLAP_TOKENS,
+                  count_tokens=count_regex_tokens):
+    return chunk_text(text, max_tokens, overlap_tokens, count_tokens)
+
+
+class ContextIndex:
+    """Chunks and BM25 index of one document, and prompt token counters.
+       stats() compares the tokens of the whole document, what every prompt
+       used to carry, with the tokens of the passages actually selected.
+       spans, the (start, end) chunk offsets from passage_spans(), can be
+       passed in when they were stored from an earlier run
+    """
+
+    def __init__(self, text, max_tokens=PASSAGE_TOKENS, overlap_tokens=PASSAGE_OVERLAP_TOKENS,
+                 count_tokens=count_regex_tokens, spans=None):
+        self.text = text
+        self.count_tokens = count_tokens
+        if spans is None:
+            spans = passage_spans(text, max_tokens, overlap_tokens, count_tokens)
+        self.spans = [tuple(span) for span in spans]
+        self.span_tokens = [count_tokens(text[start:end]) for start, end in self.spans]
+        self.document_tokens = count_tokens(text)
+        self.lexical = BM25Index()
+        for chunk_id, (start, end) in enumerate(self.spans):
+            self.lexical.add(chunk_id, text[start:end])
+        self.queries = 0
+        self.context_tokens = 0
+
+    def select(self, query, budget=CONTEXT_TOKEN_BUDGET):
+        """Return (chunk ids, context text) for the best chunks that fit in budget tokens"""
+        ranked = [chunk_id for _, chunk_id in self.lexical.search(query, len(self.spans))]
+        if not ranked:
+            ranked = range(len(self.spans))
+        chosen = []
+        used = 0
+        for chunk_id in ranked:
+            if used + self.span_tokens[chunk_id] > budget:
+                continue
+            chosen.append(chunk_id)
+            used += self.span_tokens[chunk_id]
+        chosen.sort()
+
+        passages = []
+        for chunk_id in chosen:
+            start, end = self.spans[chunk_id]
+            if passages and start <= passages[-1][1]:
+                passages[-1][1] = max(passages[-1][1], end)
+            else:
+                passages.append([start, end])
+        context = "\n\n".join(self.text[start:end] for start, end in passages)
+
+        self.queries += 1
+        self.context_tokens += self.count_tokens(context)
+        return chosen, context
+
+    def stats(self):
+        """Return the average prompt context tokens per query before (whole document) and after selection"""
+        after = self.context_tokens / self.queries if self.queries else 0.0
+        return {
+            "queries": self.queries,
+            "chunks": len(self.spans),
+            "tokens_before": self.document_tokens,
+            "tokens_after": after,
+            "saved": 1 - after / self.document_tokens if self.queries and self.document_tokens else 0.0,
+        }
@@ -0,0 +1,70 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import openai
+
+EMBEDDING_MODEL = "embedding-001"
+BATCH_SIZE = 64
+MAX_WORKERS = 4
+MAX_RETRIES = 3
+# failures that can succeed on a later attempt; a bad request (input too long,
+# unknown model, ...) fails the same way every time and is raised at once
+RETRYABLE_ERRORS = (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError,
+                    openai.InternalServerError)
+
+
+def embed_batch(client, texts, model=EMBEDDING_MODEL, max_retries=MAX_RETRIES):
+    """Embed a list of texts with a single embeddings request.
+       Connection errors, timeouts, rate limits and server errors are retried
+       with exponential backoff, other errors are raised at once. The client's
+       own retries are turned off for the request so the two do not multiply
+    """
+    client = client.with_options(max_retries=0)
+    for attempt in range(max_retries + 1):
+        try:
+            response = client.embeddings.create(input=texts, model=model)
+            break
+        except RETRYABLE_ERRORS as e:
+            if attempt == max_retries:
+                raise
+            delay = 2 ** attempt
+            print(f"Embedding batch of {len(texts)} failed ({e}), retrying in {delay}s")
+            time.sleep(delay)
+
+    data = sorted(response.data, key=lambda item: item.index)
+    return np.array([item.embedding for item in data], dtype=np.float32)
+
+
+def embed_texts(client, texts, model=EMBEDDING_MODEL, batch_size=BATCH_SIZE,
+                max_workers=MAX_WORKERS, max_retries=MAX_RETRIES, cache=None):
+    """Embed many texts, batch_size texts per request and up to max_workers requests at once.
+       Texts already in the cache are not sent to the API, and every batch is
+       cached as soon as it is embedded, so a failed batch does not lose the others.
+       Returns a float32 matrix with one row per text, in input order
+    """
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    vectors = cache.get_many(model, texts) if cache is not None else [None] * len(texts)
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+    if missing:
+        # embed each distinct missing text once
+        unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+        batches = [unique_texts[i:i + batch_size] for i in range(0, len(unique_texts), batch_size)]
+
+        def embed_and_cache(batch):
+            batch_vectors = embed_batch(client, batch, model, max_retries)
+            if cache is not None:
+                cache.put_many(model, batch, batch_vectors)
+            return batch_vectors
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            new_vectors = np.vstack(list(pool.map(embed_and_cache, batches)))
+        by_text = dict(zip(unique_texts, new_vectors))
+        for i in missing:
+            vectors[i] = by_text[texts[i]]
+
+    return np.vstack(vectors).astype(np.float32)
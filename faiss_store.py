@@ -0,0 +1,442 @@
+"""On-disk layout for the FAISS vector store.
+
+A store is a directory with six files:
+    index.faiss     the FAISS index keyed by chunk id, so ids are stable across
+                    updates; IVF indexes hold the ids in their inverted lists,
+                    the other types are wrapped in an IndexIDMap2
+    chunks.txt      the UTF-8 text of every chunk ever added, back to back
+    chunks.offsets  int64 byte offsets, chunk i is chunks.txt[offsets[i]:offsets[i + 1]]
+    vectors.f32     unit length float32 embeddings, row i belongs to chunk i
+    bm25.json       a BM25 inverted index over the live chunks, see bm25.py
+    manifest.json   the next free chunk id, how the index was built and, per
+                    source file, its mtime, size, sha256 and chunk ids; the ids
+                    of a file are contiguous and stored as [first id, count]
+
+Everything is memory-mapped on load, so opening a store costs the same for
+one PDF or ten thousand, and several processes serving the same store share
+its pages through the OS page cache.
+
+sync() only chunks and embeds source files that are new or whose content
+changed, and removes the chunk ids of files that were deleted. Text and
+vectors of removed chunks stay on disk until the store is rebuilt.
+
+The index type is one of INDEX_TYPES. Flat is an exact scan; the IVF and
+HNSW types are approximate and trade recall for query speed. Because the
+raw vectors are kept, an index can be retrained or rebuilt as another type
+without calling the embedding API again.
+
+Vectors are L2 normalized before they are stored and queries must be too
+(normalize_queries), so inner product search ranks by cosine similarity.
+vector_storage "float16" or "int8" keeps the vectors inside the index as
+scalar quantized codes, cutting index memory by 2x or 4x; vectors.f32 stays
+float32 so the index can always be rebuilt losslessly.
+
+Besides vector search the store offers lexical (BM25) search, which needs
+no query embedding, and hybrid search, which fuses both rankings with
+reciprocal rank fusion. The BM25 index is only loaded when first used, and
+unlike the rest of the store it is not memory-mapped: the first lexical or
+hybrid search parses all of bm25.json into the process heap. Its load time
+and memory grow with the corpus and every serving process pays them again,
+nothing is shared through the page cache. Vector search is the default for
+that reason.
+"""
+import hashlib
+import json
+import mmap
+import os
+
+import faiss
+import numpy as np
+
+from atomic_write import write_atomic
+from bm25 import BM25Index, reciprocal_rank_fusion
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.txt"
+OFFSETS_FILE = "chunks.offsets"
+VECTORS_FILE = "vectors.f32"
+MANIFEST_FILE = "manifest.json"
+BM25_FILE = "bm25.json"
+
+# bumped whenever the stored chunks or vectors change meaning, older stores are rebuilt on open;
+# version 3 only differs in how the manifest lists chunk ids and is upgraded in place
+STORE_VERSION = 4
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+VECTOR_STORAGE = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+DEFAULT_INDEX_OPTIONS = {
+    "index_type": "flat",
+    "vector_storage": "float32",  # float32, float16 or int8 codes in flat, IVF-Flat and HNSW indexes
+    "nlist": 256,      # IVF: number of clusters
+    "pq_m": 64,        # IVF-PQ: sub-quantizers, must divide the embedding dimension
+    "hnsw_m": 32,      # HNSW: neighbours per node
+    "nprobe": 16,      # IVF: clusters visited per query
+    "ef_search": 64,   # HNSW: candidate list size per query
+}
+# options that change how the index is built, as opposed to how it is searched
+BUILD_OPTIONS = ("index_type", "vector_storage", "nlist", "pq_m", "hnsw_m")
+# IVF and int8 indexes are retrained once the corpus has grown this many times past their training set
+RETRAIN_GROWTH = 4
+# training uses a random sample of at most this many vectors
+MAX_TRAINING_VECTORS = 100_000
+# sync embeds and appends new chunks this many at a time
+SYNC_BATCH = 1024
+# hybrid search fuses this many candidates per ranking for every result it returns
+HYBRID_CANDIDATES = 4
+
+# IO_FLAG_MMAP_IFC maps flat vector codes without copying them (faiss >= 1.8),
+# IVF indexes only accept IO_FLAG_MMAP for their inverted lists
+MMAP_FLAG_CHOICES = [
+    faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY,
+    faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+]
+
+
+class ChunkFile:
+    """Read-only, lazily loaded chunk texts backed by chunks.txt and chunks.offsets"""
+
+    def __init__(self, store_dir):
+        self.offsets = np.memmap(os.path.join(store_dir, OFFSETS_FILE), dtype=np.int64, mode="r")
+        with open(os.path.join(store_dir, CHUNKS_FILE), "rb") as f:
+            # mmap cannot map an empty file
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, chunk_id):
+        if not 0 <= chunk_id < len(self):
+            raise IndexError(f"chunk {chunk_id} out of range")
+        return self.data[self.offsets[chunk_id]:self.offsets[chunk_id + 1]].decode("utf-8")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_index(path):
+    for flags in MMAP_FLAG_CHOICES:
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError:
+            continue
+    # index types without mmap support are read into memory
+    return faiss.read_index(path)
+
+
+def normalize_queries(queries):
+    """Return the query vectors as a contiguous, unit length float32 matrix"""
+    queries = np.array(queries, dtype=np.float32, ndmin=2)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def search(index, chunks, query_vectors, top_k):
+    """Search all query vectors with a single index.search call.
+       Returns one list of (score, chunk id, chunk text) per query, best first
+    """
+    scores, ids = index.search(normalize_queries(query_vectors), top_k)
+    return [[(float(score), int(chunk_id), chunks[chunk_id])
+             for score, chunk_id in zip(row_scores, row_ids) if chunk_id != -1]
+            for row_scores, row_ids in zip(scores, ids)]
+
+
+def build_index(vectors, ids, options):
+    """Build and fill an index of options["index_type"] over vectors, keyed by ids.
+       Returns (index, index_type). Corpora too small to train the requested
+       type get a flat index instead
+    """
+    n, dim = vectors.shape
+    index_type = options["index_type"]
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+    if index_type == "ivf_pq" and dim % options["pq_m"]:
+        raise ValueError(f"pq_m {options['pq_m']} must divide the embedding dimension {dim}")
+    if options["vector_storage"] not in VECTOR_STORAGE:
+        raise ValueError(f"Unknown vector storage {options['vector_storage']!r}, expected one of {tuple(VECTOR_STORAGE)}")
+    codes = VECTOR_STORAGE[options["vector_storage"]]
+
+    nlist = min(options["nlist"], max(1, n // 39))
+    if index_type == "ivf_flat" and nlist < 2:
+        index_type = "flat"
+    if index_type == "ivf_pq" and n < 256:
+        index_type = "flat"
+
+    description = {
+        "flat": codes,
+        "ivf_flat": f"IVF{nlist},{codes}",
+        "ivf_pq": f"IVF{nlist},PQ{options['pq_m']}",
+        "hnsw": f"HNSW{options['hnsw_m']}" + ("" if codes == "Flat" else f"_{codes}"),
+    }[index_type]
+    index = faiss.index_factory(dim, description, faiss.METRIC_INNER_PRODUCT)
+    if not index_type.startswith("ivf"):
+        # IVF remove_ids leaves the remaining entries where they are, but IndexIDMap2
+        # compacts its id map anyway, so an IVF index must keep the ids itself
+        index = faiss.IndexIDMap2(index)
+    if not index.is_trained:
+        sample = vectors
+        if n > MAX_TRAINING_VECTORS:
+            sample = vectors[np.sort(np.random.default_rng(0).choice(n, MAX_TRAINING_VECTORS, replace=False))]
+        index.train(sample)
+    if n:
+        index.add_with_ids(vectors, ids)
+    set_search_params(index, options)
+    return index, index_type
+
+
+def set_search_params(index, options):
+    """Apply nprobe / efSearch to an IVF or HNSW index, other types are left alone"""
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexIVF):
+        inner.nprobe = options["nprobe"]
+    elif isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = options["ef_search"]
+
+
+class FaissStore:
+    """An incrementally updated FAISS index over the chunks of a set of source files"""
+
+    def __init__(self, store_dir, **index_options):
+        self.store_dir = store_dir
+        self.options = {**DEFAULT_INDEX_OPTIONS, **index_options}
+        self.manifest = self._empty_manifest()
+        self.chunks = None
+        self.vectors = None
+        self.index = None
+        self._lexical = None
+        if os.path.exists(self._path(MANIFEST_FILE)):
+            self._open()
+            if self.manifest.get("version") == 3:
+                self._upgrade_manifest()
+            if self.manifest.get("version") != STORE_VERSION:
+                print(f"Vector store in {store_dir} has an old format, it will be rebuilt")
+                self.manifest = self._empty_manifest()
+                self.chunks = self.vectors = self.index = None
+                self._lexical = BM25Index()
+
+    @staticmethod
+    def _empty_manifest():
+        return {"version": STORE_VERSION, "next_id": 0, "dim": None, "index": None, "sources": {}}
+
+    def _upgrade_manifest(self):
+        """Version 3 listed every chunk id of a source, store them as [first id, count] instead"""
+        for source in self.manifest["sources"].values():
+            ids = source.pop("ids")
+            source["chunks"] = [ids[0] if ids else self.manifest["next_id"], len(ids)]
+        self.manifest["version"] = STORE_VERSION
+        self._write_manifest()
+
+    def _path(self, name):
+        return os.path.join(self.store_dir, name)
+
+    def _open(self):
+        with open(self._path(MANIFEST_FILE), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.chunks = ChunkFile(self.store_dir)
+        if self.manifest["dim"]:
+            self.vectors = np.memmap(self._path(VECTORS_FILE), dtype=np.float32, mode="r",
+                                     shape=(self.manifest["next_id"], self.manifest["dim"]))
+        if os.path.exists(self._path(INDEX_FILE)):
+            self.index = _read_index(self._path(INDEX_FILE))
+            set_search_params(self.index, self.options)
+
+    @property
+    def lexical(self):
+        """The BM25 index, loaded on first use and rebuilt from the chunks if its file is missing"""
+        if self._lexical is None:
+            live_ids = [int(chunk_id) for chunk_id in self.live_ids()]
+            if os.path.exists(self._path(BM25_FILE)):
+                with open(self._path(BM25_FILE), encoding="utf-8") as f:
+                    self._lexical = BM25Index.from_json(f.read())
+            if self._lexical is None or set(self._lexical.doc_lengths) != set(live_ids):
+                # missing, or left out of step with the manifest by an interrupted update
+                self._lexical = BM25Index()
+                for chunk_id in live_ids:
+                    self._lexical.add(chunk_id, self.chunks[chunk_id])
+        return self._lexical
+
+    def search(self, query_vectors, top_k):
+        if self.index is None:
+            return [[] for _ in range(len(query_vectors))]
+        return search(self.index, self.chunks, query_vectors, top_k)
+
+    def search_lexical(self, queries, top_k):
+        """BM25 search, returns one list of (score, chunk id, chunk text) per query"""
+        return [[(score, chunk_id, self.chunks[chunk_id]) for score, chunk_id in self.lexical.search(query, top_k)]
+                for query in queries]
+
+    def search_hybrid(self, queries, query_vectors, top_k):
+        """Fuse the vector and BM25 rankings of every query with reciprocal rank fusion"""
+        candidates = top_k * HYBRID_CANDIDATES
+        results = []
+        for vector_hits, lexical_hits in zip(self.search(query_vectors, candidates),
+                                             self.search_lexical(queries, candidates)):
+            fused = reciprocal_rank_fusion([[chunk_id for _, chunk_id, _ in vector_hits],
+                                            [chunk_id for _, chunk_id, _ in lexical_hits]])
+            results.append([(score, chunk_id, self.chunks[chunk_id]) for score, chunk_id in fused[:top_k]])
+        return results
+
+    def live_ids(self):
+        ranges = [np.arange(start, start + count, dtype=np.int64)
+                  for start, count in (source["chunks"] for source in self.manifest["sources"].values())]
+        return np.sort(np.concatenate(ranges)) if ranges else np.empty(0, dtype=np.int64)
+
+    def changed_sources(self, paths):
+        """Compare paths with the manifest, returns (new_or_changed, touched, removed).
+           touched files have a new mtime but the same content
+        """
+        known = self.manifest["sources"]
+        changed, touched = [], []
+        for path in paths:
+            entry = known.get(path)
+            stat = os.stat(path)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                continue
+            if entry and entry["sha256"] == file_sha256(path):
+                entry["mtime"] = stat.st_mtime
+                touched.append(path)
+            else:
+                changed.append(path)
+        wanted = set(paths)
+        removed = [path for path in known if path not in wanted]
+        return changed, touched, removed
+
+    def _options_changed(self):
+        built = self.manifest["index"]
+        return built is not None and any(built[name] != self.options[name] for name in BUILD_OPTIONS)
+
+    def _needs_rebuild(self, stale_ids, first_new_id):
+        built = self.manifest["index"]
+        if self.index is None or built is None or self._options_changed():
+            return True
+        if built["built_as"] != self.options["index_type"]:
+            # the corpus used to be too small to train the wanted type
+            return True
+        if built["built_as"] == "hnsw" and (stale_ids or self.index.ntotal != np.count_nonzero(self.live_ids() < first_new_id)):
+            # HNSW graphs do not support removal, neither of stale ids nor of ids
+            # left behind by an update that was interrupted before its manifest was written
+            return True
+        if built["built_as"].startswith("ivf") and stale_ids and isinstance(self.index, faiss.IndexIDMap):
+            # written before IVF indexes kept their own ids, removing through the id map would shift them
+            return True
+        if built["built_as"].startswith("ivf") or built["vector_storage"] == "int8":
+            # IVF centroids and the int8 value ranges are trained on the vectors of the last build,
+            # vectors added since are assigned or clipped with what was learned then
+            return len(self.live_ids()) > RETRAIN_GROWTH * built["trained_on"]
+        return False
+
+    def sync(self, paths, read_chunks, embed):
+        """Bring the store in line with paths.
+           read_chunks(path) yields the chunk texts of a file, embed(chunks) returns their vectors.
+           Only new or changed files are read and embedded, SYNC_BATCH chunks at a time, so
+           memory stays bounded however much of the corpus changed
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        changed, touched, removed = self.changed_sources(paths)
+        if not changed and not removed and not self._options_changed():
+            if touched:
+                self._write_manifest()
+            return {"added": [], "removed": []}
+
+        # load the BM25 index while it still matches the manifest
+        lexical = self.lexical
+        stale_ids = []
+        for path in changed + removed:
+            if path in self.manifest["sources"]:
+                start, count = self.manifest["sources"][path]["chunks"]
+                stale_ids.extend(range(start, start + count))
+        for path in removed:
+            del self.manifest["sources"][path]
+        for chunk_id in stale_ids:
+            lexical.remove(chunk_id, self.chunks[chunk_id])
+
+        first_new_id = self.manifest["next_id"]
+        os.makedirs(self.store_dir, exist_ok=True)
+        offsets = [np.array(self.chunks.offsets) if self.chunks is not None else np.zeros(1, dtype=np.int64)]
+        with open(self._path(CHUNKS_FILE), "ab") as chunk_file, open(self._path(VECTORS_FILE), "ab") as vector_file:
+            # truncating first drops anything left behind by an interrupted update
+            chunk_file.truncate(offsets[0][-1])
+            vector_file.truncate(first_new_id * (self.manifest["dim"] or 0) * 4)
+            batch = []
+            for path in changed:
+                start = self.manifest["next_id"] + len(batch)
+                count = 0
+                for chunk in read_chunks(path):
+                    if not chunk:
+                        continue
+                    batch.append(chunk)
+                    count += 1
+                    if len(batch) == SYNC_BATCH:
+                        self._append(batch, embed, chunk_file, vector_file, offsets, lexical)
+                        batch = []
+                stat = os.stat(path)
+                self.manifest["sources"][path] = {
+                    "mtime": stat.st_mtime,
+                    "size": stat.st_size,
+                    "sha256": file_sha256(path),
+                    "chunks": [start, count],
+                }
+            if batch:
+                self._append(batch, embed, chunk_file, vector_file, offsets, lexical)
+
+        # readers holding the old offsets never look past their end
+        write_atomic(self._path(OFFSETS_FILE), np.concatenate(offsets).astype(np.int64).tobytes())
+        self._write_index(stale_ids, first_new_id)
+        write_atomic(self._path(BM25_FILE), lexical.to_json().encode("utf-8"))
+        self._write_manifest()
+        self._open()
+        return {"added": changed, "removed": removed}
+
+    def rebuild(self):
+        """Rebuild the index from the stored vectors, e.g. after changing the index type"""
+        self._write_index([], self.manifest["next_id"], force=True)
+        self._write_manifest()
+        self._open()
+
+    def _append(self, texts, embed, chunk_file, vector_file, offsets, lexical):
+        """Embed one batch of new chunks and append their text, offsets, vectors and BM25 postings"""
+        vectors = np.array(embed(texts), dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        self.manifest["dim"] = vectors.shape[1]
+        encoded = [text.encode("utf-8") for text in texts]
+        chunk_file.writelines(encoded)
+        vector_file.write(vectors.tobytes())
+        offsets.append(offsets[-1][-1] + np.cumsum([len(data) for data in encoded], dtype=np.int64))
+        for chunk_id, text in enumerate(texts, self.manifest["next_id"]):
+            lexical.add(chunk_id, text)
+        self.manifest["next_id"] += len(texts)
+
+    def _write_index(self, stale_ids, first_new_id, force=False):
+        if self.manifest["dim"] is None:
+            return
+        vectors = np.memmap(self._path(VECTORS_FILE), dtype=np.float32, mode="r",
+                            shape=(self.manifest["next_id"], self.manifest["dim"]))
+        if force or self._needs_rebuild(stale_ids, first_new_id):
+            live_ids = self.live_ids()
+            index, built_as = build_index(np.ascontiguousarray(vectors[live_ids]), live_ids, self.options)
+            self.manifest["index"] = {**{name: self.options[name] for name in BUILD_OPTIONS},
+                                      "built_as": built_as,
+                                      "trained_on": len(live_ids)}
+        else:
+            # the memory-mapped index is read-only, updates go through an in-memory copy
+            index = faiss.read_index(self._path(INDEX_FILE))
+            if self.manifest["index"]["built_as"] != "hnsw":
+                # drop ids left behind by an update that was interrupted before its manifest was written,
+                # an HNSW index cannot remove them and _needs_rebuild has checked it holds none
+                index.remove_ids(faiss.IDSelectorRange(first_new_id, np.iinfo(np.int64).max))
+            if stale_ids:
+                index.remove_ids(np.array(stale_ids, dtype=np.int64))
+            for start in range(first_new_id, self.manifest["next_id"], SYNC_BATCH):
+                end = min(start + SYNC_BATCH, self.manifest["next_id"])
+                index.add_with_ids(np.ascontiguousarray(vectors[start:end]), np.arange(start, end, dtype=np.int64))
+
+        tmp_index = self._path(INDEX_FILE + ".tmp")
+        faiss.write_index(index, tmp_index)
+        os.replace(tmp_index, self._path(INDEX_FILE))
+
+    def _write_manifest(self):
+        write_atomic(self._path(MANIFEST_FILE), json.dumps(self.manifest, indent=1).encode("utf-8"))
@@ -0,0 +1,124 @@
+"""Conditional HTTP fetching with an on-disk, content addressed cache.
+
+The cache directory holds:
+    urls/<sha256 of url>.json      url, ETag, Last-Modified and sha256 of the last body
+    objects/<sha256>               the body, stored once per distinct content
+    objects/<sha256>.<name>.json   artifacts derived from that body, e.g. parsed text
+
+A fetch of a known url sends If-None-Match / If-Modified-Since, so when the
+upstream bytes are unchanged a restart costs one 304 round trip and reuses
+the stored body and everything derived from it. If the server is not
+reachable or answers with a server error the last stored body is used. All requests go through one pooled
+requests.Session, so connections are kept alive between fetches.
+"""
+import hashlib
+import json
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from atomic_write import write_atomic
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache", "http")
+TIMEOUT_SECONDS = 10
+POOL_SIZE = 8
+USER_AGENT = "Mozilla/5.0"
+
+
+def create_session(pool_size=POOL_SIZE):
+    """A requests.Session that keeps up to pool_size connections per host alive"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+class CachedResponse:
+    """The body of a fetched url: path is the stored copy, sha256 its content hash.
+       status is 200 for a new or changed body, 304 when the stored copy was
+       revalidated and None when the server could not be reached or failed
+    """
+
+    def __init__(self, url, path, sha256, status):
+        self.url = url
+        self.path = path
+        self.sha256 = sha256
+        self.status = status
+
+    @property
+    def content(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+class HttpCache:
+    def __init__(self, cache_dir=CACHE_DIR, session=None, timeout=TIMEOUT_SECONDS):
+        self.cache_dir = cache_dir
+        self.session = session or create_session()
+        self.timeout = timeout
+        os.makedirs(os.path.join(cache_dir, "urls"), exist_ok=True)
+        os.makedirs(os.path.join(cache_dir, "objects"), exist_ok=True)
+
+    def _meta_path(self, url):
+        return os.path.join(self.cache_dir, "urls", hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _object_path(self, sha256):
+        return os.path.join(self.cache_dir, "objects", sha256)
+
+    def _load_meta(self, url):
+        try:
+            with open(self._meta_path(url), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # the body may have been cleaned up by hand, then the metadata is useless
+        return meta if os.path.exists(self._object_path(meta["sha256"])) else None
+
+    def fetch(self, url):
+        """Return a CachedResponse for url, downloading the body only if it changed upstream"""
+        meta = self._load_meta(url)
+        headers = {}
+        if meta and meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta and meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException:
+            if meta is None:
+                raise
+            print(f"Could not reach {url}, using the cached copy")
+            return CachedResponse(url, self._object_path(meta["sha256"]), meta["sha256"], None)
+        if response.status_code == 304 and meta is not None:
+            return CachedResponse(url, self._object_path(meta["sha256"]), meta["sha256"], 304)
+        if response.status_code >= 500 and meta is not None:
+            print(f"{url} answered {response.status_code}, using the cached copy")
+            return CachedResponse(url, self._object_path(meta["sha256"]), meta["sha256"], None)
+        response.raise_for_status()
+
+        sha256 = hashlib.sha256(response.content).hexdigest()
+        path = self._object_path(sha256)
+        if not os.path.exists(path):
+            write_atomic(path, response.content)
+        meta = {"url": url, "sha256": sha256,
+                "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        write_atomic(self._meta_path(url), json.dumps(meta).encode("utf-8"))
+        return CachedResponse(url, path, sha256, response.status_code)
+
+    def artifact(self, response, name, build):
+        """Return build() for the body of response, computed once per distinct body and stored as json.
+           name must change whenever build would produce something different for the same body
+        """
+        path = f"{self._object_path(response.sha256)}.{name}.json"
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+        value = build()
+        write_atomic(path, json.dumps(value).encode("utf-8"))
+        return value
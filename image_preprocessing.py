@@ -0,0 +1,47 @@
+"""Shrink images before they are sent to a vision model.
+
+prepare_image() applies the EXIF orientation, downscales so the longest
+side is at most max_dimension and re-encodes in the detected format. JPEG
+and WEBP are re-encoded at `quality`, PNG losslessly. Formats a model may
+not accept (BMP, TIFF, ...) become JPEG, or PNG when they have an alpha
+channel. EXIF and other metadata are never copied into the new image, so
+GPS positions and camera details are not uploaded.
+"""
+import base64
+import io
+
+from PIL import Image, ImageOps
+
+MAX_DIMENSION = 1568
+QUALITY = 85
+# formats sent as they are (after resizing), everything else is converted
+KEEP_FORMATS = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+
+def prepare_image(path, max_dimension=MAX_DIMENSION, quality=QUALITY):
+    """Return (mime type, encoded bytes) of the image at path, resized and without metadata"""
+    with Image.open(path) as image:
+        source_format = image.format
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        if source_format in KEEP_FORMATS:
+            target_format = source_format
+        else:
+            target_format = "PNG" if image.mode in ("RGBA", "LA") or "transparency" in image.info else "JPEG"
+
+        if target_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif target_format != "JPEG" and image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            image = image.convert("RGBA")
+
+        options = {"optimize": True}
+        if target_format in ("JPEG", "WEBP"):
+            options["quality"] = quality
+        buffer = io.BytesIO()
+        image.save(buffer, target_format, **options)
+    return KEEP_FORMATS[target_format], buffer.getvalue()
+
+
+def to_data_url(mime, data):
+    return f"data:{mime};base64,{base64.b64encode(data).decode('utf-8')}"
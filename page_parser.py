@@ -0,0 +1,38 @@
+"""HTML parsing for web_crawler.py. It runs in the crawler's spawned worker
+processes, so it imports only the standard library; lxml is imported by the
+worker on its first page
+"""
+import posixpath
+from urllib.parse import parse_qsl, urldefrag, urlencode, urljoin, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonical_url(url, base=None):
+    """Absolute url with the fragment and default port dropped, scheme and host lower cased and the query sorted"""
+    url, _ = urldefrag(urljoin(base, url) if base else url)
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    netloc = host if parts.port in (None, DEFAULT_PORTS.get(scheme)) else f"{host}:{parts.port}"
+    path = posixpath.normpath(parts.path) if parts.path not in ("", "/") else "/"
+    if parts.path.endswith("/") and path != "/":
+        path += "/"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def parse_html(url, content):
+    """Return (title, text, links, canonical url) of an HTML page, runs in a worker process"""
+    import lxml.html
+
+    document = lxml.html.fromstring(content, base_url=url)
+    for element in document.xpath("//script|//style|//noscript|//template"):
+        element.drop_tree()
+    title = (document.findtext(".//title") or "").strip()
+    body = document.find("body")
+    text = "\n".join(line.strip() for line in (body if body is not None else document).itertext() if line.strip())
+    links = [canonical_url(href, url) for href in document.xpath("//a/@href")
+             if urlsplit(urljoin(url, href)).scheme in ("http", "https")]
+    canonical = document.xpath("//link[@rel='canonical']/@href")
+    return title, text, links, canonical_url(canonical[0], url) if canonical else url
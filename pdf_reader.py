@@ -0,0 +1,45 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+
+# smaller PDFs are read in this process, starting worker processes costs more than it saves
+PARALLEL_MIN_PAGES = 64
+PAGES_PER_TASK = 16
+
+
+def _extract_page_range(pdf_path, start, stop):
+    """Worker: text of pages start..stop-1, empty string for pages without text"""
+    with open(pdf_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def iter_pdf_pages(pdf_path, max_workers=None):
+    """Yield the text of every page in order, one page at a time.
+       Large PDFs are extracted by a process pool, with at most two tasks
+       per worker in flight so memory stays bounded
+    """
+    with open(pdf_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        page_count = len(reader.pages)
+        max_workers = max_workers or os.cpu_count() or 1
+        if page_count < PARALLEL_MIN_PAGES or max_workers == 1:
+            for page in reader.pages:
+                yield page.extract_text() or ""
+            return
+
+    ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = []
+        for start, stop in ranges:
+            pending.append(pool.submit(_extract_page_range, pdf_path, start, stop))
+            if len(pending) >= 2 * max_workers:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def read_pdf(pdf_path):
+    """Return the text of the whole PDF"""
+    return "".join(iter_pdf_pages(pdf_path))
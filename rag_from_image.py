@@ -1,42 +1,106 @@
-#step 1 Import the libs
-from openai import OpenAI
-import gradio as gr 
-from dotenv import load_dotenv
-import os
-import base64
-
-#Step 2 Loading Secrets
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
-
-client = OpenAI(base_url=base_url,api_key=api_key)
-
-def get_response(image_path):
-    if image_path is None:
-        return "Please upload the image file"
-    
-    with open(image_path,"rb") as image_file:
-        base64_image = base64.b64encode(image_file.read()).decode("utf-8")
-    
-    response = client.chat.completions.create(
-        model="gemini-2.5-flash",
-        messages=[{"role":"user","content":[
-                {"type":"text","text":"who is the pay name"},
-                {
-                    "type": "image_url",
-                    "image_url":{"url":f"data:image/jpeg;base64,{base64_image}"}   
-                 }
-                ]
-                }
-        ]
-    )
-    return response.choices[0].message.content
-
-gr.Interface(
-    fn = get_response,
-    inputs= gr.Image(type="filepath",label="Upload an Image"),
-    outputs=gr.Textbox(label="Image Description"),
-    title="AI image Describer"
-    
-).launch()
\ No newline at end of file
+#step 1 Import the libs
+# gradio is only imported when the app is launched, it takes seconds to import
+from openai import OpenAI
+from dotenv import load_dotenv
+import os
+import sys
+import glob
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from atomic_write import write_atomic
+from image_preprocessing import prepare_image, to_data_url
+
+#Step 2 Loading Secrets
+load_dotenv()
+api_key = os.getenv("GOOGLE_API_KEY")
+base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
+
+client = OpenAI(base_url=base_url,api_key=api_key)
+
+#Step 3 settings
+model = "gemini-2.5-flash"
+prompt = "who is the pay name"
+# images are downscaled so the longest side is at most this many pixels before upload
+max_image_dimension = 1568
+image_quality = 85
+# batch mode: images described at once, and where answers are cached by image hash
+batch_workers = 4
+answer_cache_dir = os.path.join(os.path.dirname(__file__), ".cache", "image_answers")
+image_extensions = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff")
+
+
+def get_response(image_path):
+    if image_path is None:
+        return "Please upload the image file"
+
+    mime, image_bytes = prepare_image(image_path, max_image_dimension, image_quality)
+    response = client.chat.completions.create(
+        model=model,
+        messages=[{"role":"user","content":[
+                {"type":"text","text":prompt},
+                {
+                    "type": "image_url",
+                    "image_url":{"url":to_data_url(mime, image_bytes)}
+                 }
+                ]
+                }
+        ]
+    )
+    return response.choices[0].message.content
+
+
+#Step 4 batch mode
+def answer_cache_key(image_path):
+    """Hash of the image bytes and of everything else that changes the answer"""
+    digest = hashlib.sha256()
+    with open(image_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(f"\0{model}\0{prompt}\0{max_image_dimension}\0{image_quality}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_cached_response(image_path):
+    cache_path = os.path.join(answer_cache_dir, answer_cache_key(image_path) + ".txt")
+    if os.path.exists(cache_path):
+        with open(cache_path, encoding="utf-8") as f:
+            return f.read()
+    answer = get_response(image_path)
+    os.makedirs(answer_cache_dir, exist_ok=True)
+    write_atomic(cache_path, answer.encode("utf-8"))
+    return answer
+
+
+def describe_directory(directory, max_workers=batch_workers):
+    """Describe every image in directory, at most max_workers at a time.
+       Returns {path: answer}; images seen before are answered from the cache,
+       an image that fails gets the error message as its answer
+    """
+    paths = sorted(path for path in glob.glob(os.path.join(directory, "*"))
+                   if path.lower().endswith(image_extensions))
+
+    def describe(path):
+        try:
+            return get_cached_response(path)
+        except Exception as e:
+            return f"Error: {e}"
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return dict(zip(paths, executor.map(describe, paths)))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # python rag_from_image.py <directory of images>
+        for path, answer in describe_directory(sys.argv[1]).items():
+            print(f"{os.path.basename(path)}: {answer}")
+    else:
+        import gradio as gr
+
+        gr.Interface(
+            fn = get_response,
+            inputs= gr.Image(type="filepath",label="Upload an Image"),
+            outputs=gr.Textbox(label="Image Description"),
+            title="AI image Describer"
+
+        ).launch()
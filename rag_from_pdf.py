@@ -1,50 +1,89 @@
-# step 1 - importing libs
-from openai import OpenAI
-import gradio as gr
-import requests
-import os
-import PyPDF2
-from dotenv import load_dotenv
-
-# step 2 - loading secrets
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
-client = OpenAI(api_key=api_key, base_url=base_url)
-
-# step 3 - getting info from web: https://hereandnowai.github.io/vac/
-url = "https://raw.githubusercontent.com/hereandnowai/rag-workshop/main/pdfs/About_HERE_AND_NOW_AI.pdf"
-response = requests.get(url)
-
-# step 4 - save the pdf in cwd
-pdf_file_name = "profile-of-hereandnowai.pdf"
-pdf_path = os.path.join(os.path.dirname(__file__), pdf_file_name)
-
-with open(pdf_path, "wb") as f:
-    f.write(response.content)
-
-# step 6 - extract text from pdf
-try:
-    with open(pdf_path, "rb") as file:
-        reader = PyPDF2.PdfReader(file)
-        pdf_text_chunks = []
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                pdf_text_chunks.append(page_text.strip())
-        pdf_context = "\n".join(pdf_text_chunks) if pdf_text_chunks else "no text found"
-except Exception as e:
-    print(f"Error reading pdf: {e}")
-    pdf_context = "Error extracting text from pdf"
-
-
-# step 7 - fn
-def get_response(HumanMessage, history):
-    messages = f"Context from {pdf_path}:\n{pdf_context}\n\nQuestion: {HumanMessage}\n\nAnswer only based on the context"
-    response = client.chat.completions.create(model="gemini-2.5-flash",
-                                              messages=[{"role":"user",
-                                                         "content":messages}])
-    return response.choices[0].message.content
-
-if __name__ == "__main__":
-    print(get_response("who is the cto of here and now ai?", []))
\ No newline at end of file
+# step 1 - importing libs
+from openai import OpenAI
+import gradio as gr
+import os
+import PyPDF2
+from dotenv import load_dotenv
+from answer_cache import AnswerCache, context_key
+from embedding_cache import EmbeddingCache
+from embedding_utils import embed_texts
+from chat_stream import stream_chat
+from context_budget import ContextIndex, passage_spans, PASSAGE_TOKENS, PASSAGE_OVERLAP_TOKENS
+from http_cache import HttpCache
+
+# step 2 - loading secrets
+load_dotenv()
+api_key = os.getenv("GOOGLE_API_KEY")
+base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
+client = OpenAI(api_key=api_key, base_url=base_url)
+
+# step 3 - getting the pdf, the copy in .cache/http is revalidated with an ETag
+# so a restart costs one 304 round trip and the pdf is only downloaded when it changed
+url = "https://raw.githubusercontent.com/hereandnowai/rag-workshop/main/pdfs/About_HERE_AND_NOW_AI.pdf"
+pdf_file_name = "profile-of-hereandnowai.pdf"
+http_cache = HttpCache()
+pdf_response = http_cache.fetch(url)
+pdf_path = pdf_response.path
+
+
+# step 4 - extract text from pdf
+def extract_pdf_text(path):
+    with open(path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        pdf_text_chunks = []
+        for page in reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                pdf_text_chunks.append(page_text.strip())
+    return "\n".join(pdf_text_chunks) if pdf_text_chunks else "no text found"
+
+
+# step 5 - the text and its passages are stored next to the cached pdf and reused while it is unchanged
+try:
+    pdf_context = http_cache.artifact(pdf_response, "text", lambda: extract_pdf_text(pdf_path))
+    pdf_passages = http_cache.artifact(pdf_response, f"passages-{PASSAGE_TOKENS}-{PASSAGE_OVERLAP_TOKENS}",
+                                       lambda: passage_spans(pdf_context))
+except Exception as e:
+    print(f"Error reading pdf: {e}")
+    pdf_context = "Error extracting text from pdf"
+    pdf_passages = None
+
+
+# step 7 - the pdf is chunked and indexed once, every prompt gets only the passages
+# that fit in the token budget; pdf_index.stats() shows the prompt tokens saved
+context_token_budget = 1024
+pdf_index = ContextIndex(pdf_context, spans=pdf_passages)
+
+# step 8 - answers are reused for the same or a very similar question, see answer_cache.py;
+# question embeddings go through the embedding cache shared with the other apps
+answer_cache = AnswerCache()
+embedding_cache = EmbeddingCache(os.path.join(os.path.dirname(__file__), ".cache", "embeddings.sqlite3"))
+pdf_context_id = context_key(pdf_context)
+
+
+# step 9 - fn, yields the answer so far on every token so the chat shows it as it is generated
+def get_response(HumanMessage, history):
+    chunk_ids, context = pdf_index.select(HumanMessage, context_token_budget)
+    context_id = context_key([pdf_context_id] + chunk_ids)
+    answer = answer_cache.get(HumanMessage, context_id)
+    if answer is not None:
+        yield answer
+        return
+    question_embedding = embed_texts(client, [HumanMessage], cache=embedding_cache)[0]
+    answer = answer_cache.get_similar(HumanMessage, context_id, question_embedding)
+    if answer is not None:
+        yield answer
+        return
+
+    messages = f"Context from {pdf_file_name}:\n{context}\n\nQuestion: {HumanMessage}\n\nAnswer only based on the context"
+    answer = ""
+    for answer in stream_chat(client, "gemini-2.5-flash", [{"role":"user",
+                                                            "content":messages}]):
+        yield answer
+    answer_cache.put(HumanMessage, context_id, answer, question_embedding)
+
+if __name__ == "__main__":
+    for answer in get_response("who is the cto of here and now ai?", []):
+        pass
+    print(answer)
+    print(pdf_index.stats())
\ No newline at end of file
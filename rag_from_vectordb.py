@@ -1,105 +1,176 @@
-#Step Import libraries
-from openai import OpenAI
-import gradio as gr
-from dotenv import load_dotenv
-import PyPDF2
-import os
-import requests
-import numpy as np
-import faiss
-import re
-import pickle
-
-#step 2 Loading the key
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-
-base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
-client = OpenAI(api_key= api_key,base_url= base_url)
-
-#step 3 file paths
-pdf_path = os.path.join(os.path.dirname(__file__),"profile-of-hereandnowai.pdf")
-vector_path = os.path.join(os.path.dirname(__file__),"vector_store.pkl")
-
-#step 4 reading the pdf
-def read_pdf(pdf_path):
-    text =""
-    with open(pdf_path,"rb") as f:
-        reader = PyPDF2.PdfReader(f)
-        for page in reader.pages:
-            if page.extract_text(): text += page.extract_text()        
-    return text
-
-#step 5 sentence split into chunks 
-def split_text_semanticaly(text,chunk_size = 1000):
-    sentences = re.split(r'(?<=[.!?])\s+',text)
-    chunks = []
-    current_chunk = ""
-
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) <= chunk_size:
-            current_chunk += sentence + " "
-        else:
-            chunks.append(current_chunk.strip())
-            current_chunk = sentence + " "
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    
-    return chunks
-
-#step 5 get the embeddings
-
-def get_embeddings(text):
-    response = client.embeddings.create(
-        input=text,
-        model="embedding-001"  
-    )
-    embedding = response.data[0].embedding
-    return np.array(embedding)
-
-# step 6 loading and creating the vector
-def load_or_create_vector_store():
-    if os.path.exists(vector_path):
-        with open(vector_path,"rb") as f: return pickle.load(f)
-
-    text = read_pdf(pdf_path)
-    chunks = split_text_semanticaly(text,1000)
-
-    embeddings = np.array([get_embeddings(chunk) for chunk in chunks]).astype(np.float32)
-
-    embeddings /= np.linalg.norm(embeddings,axis=0,keepdims=True)
-
-    index = faiss.IndexFlatIP(embeddings.shape[1])
-
-    index.add(embeddings)    
-
-    with open(vector_path,"wb") as f : pickle.dump((chunks, index),f)
-
-    return chunks, index
-    
-
-def search_similar_chunk(query, chunks, index , top_k=3):
-    
-    query_embedding = get_embeddings(query).astype("float32")
-        
-    Distance,Index = index.search(np.expand_dims(query_embedding,axis= 0),top_k)
-
-    return [chunks[i] for i in Index[0]]
-    
-
-def get_response(query, history):
-    context = "\n\n".join(search_similar_chunk(query,chunks,index,top_k=3 ))
-    prompt = f"context: {context}\n\n question:  {query} \n\n Answer based on the context only. If the information is not found in the context. just say it is not there in the context no explanation"
-    response = client.chat.completions.create( 
-    model="gemini-2.5-flash", 
-    messages= [{"role":"user", "content": prompt}])
-    return response.choices[0].message.content
-    
-
-chunks, index = load_or_create_vector_store()
-
-gr.ChatInterface(
-    fn = get_response,
-    title= "RAG with Vector",
-    type="messages"
-).launch()
+#Step Import libraries
+# gradio is only imported when the app is launched, it takes seconds to import
+from openai import OpenAI
+from dotenv import load_dotenv
+import os
+import glob
+from embedding_utils import embed_texts
+from embedding_cache import EmbeddingCache
+from faiss_store import FaissStore
+from pdf_reader import iter_pdf_pages
+from chunking import chunk_pages
+from timing import timed
+from answer_cache import AnswerCache, context_key
+from chat_stream import stream_chat
+
+#step 2 file paths and settings
+base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
+pdf_path = os.path.join(os.path.dirname(__file__),"profile-of-hereandnowai.pdf")
+pdf_dir = os.path.join(os.path.dirname(__file__),"PDFs")
+store_dir = os.path.join(os.path.dirname(__file__),"faiss_store")
+cache_path = os.path.join(os.path.dirname(__file__),".cache","embeddings.sqlite3")
+# index_type is one of "flat", "ivf_flat", "ivf_pq", "hnsw", see faiss_store.DEFAULT_INDEX_OPTIONS
+# for the other options. benchmarks/eval_ann_index.py helps to pick one for the corpus size
+# vector_storage "float16" or "int8" halves or quarters the index memory
+index_options = {"index_type": "flat", "vector_storage": "float32"}
+chunk_tokens = 256
+# "vector", "lexical" (BM25 only, answers without an embedding call) or "hybrid" (both, fused).
+# lexical and hybrid parse all of bm25.json into each process on the first question, see faiss_store
+retrieval_mode = "vector"
+chunk_overlap_tokens = 32
+# answers are reused for the same question, or a question whose embedding is at least
+# this cosine similar, when the same chunks are retrieved. See answer_cache.py
+answer_ttl_seconds = 60 * 60
+answer_similarity_threshold = 0.92
+
+#step 3 reading the pdf and splitting it into chunks
+def source_pdf_paths():
+    return [pdf_path] + sorted(glob.glob(os.path.join(pdf_dir,"*.pdf")))
+
+def read_chunks(path):
+    """Stream the pages of a pdf into sentence chunks of at most chunk_tokens tokens"""
+    return chunk_pages(iter_pdf_pages(path), chunk_tokens, chunk_overlap_tokens)
+
+
+#step 4 the service, heavy resources are created on first use
+class RagService:
+    """Holds the OpenAI client, the embedding cache, the vector store and the answer cache.
+       Nothing is created at import time; each resource is built the first
+       time it is needed, or all at once by warmup(). Time spent per stage
+       is recorded in self.timings
+    """
+
+    def __init__(self, base_url=base_url, api_key=None, store_dir=store_dir, cache_path=cache_path):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.store_dir = store_dir
+        self.cache_path = cache_path
+        self.timings = {}
+        self._client = None
+        self._embedding_cache = None
+        self._store = None
+        self.answer_cache = AnswerCache(ttl=answer_ttl_seconds, similarity_threshold=answer_similarity_threshold)
+
+    @property
+    def client(self):
+        if self._client is None:
+            with timed(self.timings, "create client"):
+                load_dotenv()
+                self._client = OpenAI(api_key=self.api_key or os.getenv("GOOGLE_API_KEY"), base_url=self.base_url)
+        return self._client
+
+    @property
+    def embedding_cache(self):
+        if self._embedding_cache is None:
+            with timed(self.timings, "open embedding cache"):
+                self._embedding_cache = EmbeddingCache(self.cache_path)
+        return self._embedding_cache
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = self.load_or_create_vector_store()
+        return self._store
+
+    def warmup(self):
+        """Create every resource now instead of on the first question"""
+        self.client
+        self.embedding_cache
+        self.store
+        return self
+
+    def embed_chunks(self, chunks):
+        # the store normalizes every row, so inner product search ranks by cosine similarity
+        return embed_texts(self.client, chunks, cache=self.embedding_cache)
+
+    def load_or_create_vector_store(self):
+        """Open the store and add, re-embed or drop only the PDFs that changed since the last run"""
+        with timed(self.timings, "open vector store"):
+            store = FaissStore(self.store_dir, **index_options)
+        with timed(self.timings, "sync vector store"):
+            changes = store.sync(source_pdf_paths(), read_chunks, self.embed_chunks)
+        if changes["added"] or changes["removed"]:
+            print(f"Vector store updated: {len(changes['added'])} added or changed, {len(changes['removed'])} removed")
+        return store
+
+    def get_embeddings(self, text):
+        return embed_texts(self.client, [text], cache=self.embedding_cache)[0]
+
+    def search_many(self, queries, top_k=3, mode=None):
+        """Search many queries at once in the given retrieval mode (default retrieval_mode).
+           Vector and hybrid modes embed the queries in batches and run one index.search call.
+           Returns one list of (score, chunk id, chunk text) per query
+        """
+        mode = mode or retrieval_mode
+        store = self.store
+        if mode == "lexical":
+            with timed(self.timings, "lexical search"):
+                return store.search_lexical(queries, top_k)
+        if mode not in ("vector", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode {mode!r}, expected vector, lexical or hybrid")
+
+        with timed(self.timings, "embed queries"):
+            query_embeddings = embed_texts(self.client, queries, cache=self.embedding_cache)
+        if mode == "vector":
+            with timed(self.timings, "vector search"):
+                return store.search(query_embeddings, top_k)
+        with timed(self.timings, "hybrid search"):
+            return store.search_hybrid(queries, query_embeddings, top_k)
+
+    def search_similar_chunk(self, query, top_k=3, mode=None):
+        return [text for _, _, text in self.search_many([query], top_k, mode)[0]]
+
+    def get_response(self, query, history):
+        """Yield the answer as it is generated, the text so far on every token, for gr.ChatInterface"""
+        results = self.search_many([query], top_k=3)[0]
+        # chunk ids change whenever a chunk's text does, so they identify the context
+        context_id = context_key([chunk_id for _, chunk_id, _ in results])
+        with timed(self.timings, "answer cache"):
+            answer = self.answer_cache.get(query, context_id)
+        if answer is not None:
+            yield answer
+            return
+        # in vector and hybrid mode the query embedding is already in the embedding cache,
+        # lexical mode answers without one and only reuses answers to the same question
+        query_embedding = None
+        if retrieval_mode != "lexical":
+            query_embedding = self.get_embeddings(query)
+            with timed(self.timings, "answer cache"):
+                answer = self.answer_cache.get_similar(query, context_id, query_embedding)
+            if answer is not None:
+                yield answer
+                return
+
+        context = "\n\n".join(text for _, _, text in results)
+        prompt = f"context: {context}\n\n question:  {query} \n\n Answer based on the context only. If the information is not found in the context. just say it is not there in the context no explanation"
+        answer = ""
+        for answer in stream_chat(self.client, "gemini-2.5-flash", [{"role":"user", "content": prompt}], self.timings):
+            yield answer
+        self.answer_cache.put(query, context_id, answer, query_embedding)
+
+
+service = RagService()
+get_response = service.get_response
+search_many = service.search_many
+search_similar_chunk = service.search_similar_chunk
+
+
+if __name__ == "__main__":
+    import gradio as gr
+
+    service.warmup()
+    gr.ChatInterface(
+        fn = get_response,
+        title= "RAG with Vector",
+        type="messages"
+    ).launch()
@@ -1,37 +1,201 @@
-# step 1 - importing libs
-from openai import OpenAI
-import gradio as gr
-import requests
-import os
-from bs4 import BeautifulSoup
-from dotenv import load_dotenv
-
-# step 2 - loading secrets
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-# base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
-base_url = "http://localhost:11434/v1/"
-client = OpenAI(api_key="ollama", base_url=base_url)
-
-# step 3 - getting info from web: https://hereandnowai.github.io/vac/
-url = "https://hereandnowai.github.io/vac/"
-
-response = requests.get(url,
-                        headers={"User-Agent": "Mozilla/5.0"},
-                        timeout=10)
-
-soup = BeautifulSoup(response.content, "html.parser")
-website_context = soup.body.get_text(separator="\n",
-                                     strip=True) if soup.body else "no info found"
-
-# step 4 - fn
-def get_response(HumanMessage, history):
-    messages = f"Context from {url}:\n{website_context}\n\n Question: {HumanMessage}\n Answer only based on context"
-    response = client.chat.completions.create(model="llama3.2:latest",
-                                              messages=[{"role":"user", "content":messages}])
-    return response.choices[0].message.content
-
-print(get_response("Who is the cto of here and now ai?", []))
-
-if __name__ == "__main__":
-    gr.ChatInterface(fn=get_response, title="RAG from web from HERE AND NOW AI").launch()
\ No newline at end of file
+# step 1 - importing libs
+# gradio is only imported when the app is launched, it takes seconds to import
+from openai import OpenAI
+import asyncio
+import os
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+from timing import timed
+from answer_cache import AnswerCache, context_key
+from chat_stream import stream_chat
+from context_budget import ContextIndex, passage_spans, PASSAGE_TOKENS, PASSAGE_OVERLAP_TOKENS
+from http_cache import HttpCache
+from embedding_utils import embed_texts
+from embedding_cache import EmbeddingCache
+from faiss_store import FaissStore
+from web_crawler import crawl_to_store
+from chunking import count_regex_tokens
+
+# step 2 - settings
+# base_url = "https://generativelanguage.googleapis.com/v1beta/openai/"
+base_url = "http://localhost:11434/v1/"
+model = "llama3.2:latest"
+
+# step 3 - getting info from web: https://hereandnowai.github.io/vac/
+url = "https://hereandnowai.github.io/vac/"
+http_cache_dir = os.path.join(os.path.dirname(__file__), ".cache", "http")
+# the page is chunked once and every prompt gets only the passages that fit in this many tokens
+context_token_budget = 1024
+# crawl_max_pages > 0 indexes the whole site under url with web_crawler.py instead of the one page,
+# into a vector store embedded by embedding_model (pull it first: ollama pull nomic-embed-text)
+crawl_max_pages = 0
+crawl_max_depth = 3
+embedding_model = "nomic-embed-text"
+site_store_dir = os.path.join(os.path.dirname(__file__), "faiss_store_web")
+site_pages_dir = os.path.join(os.path.dirname(__file__), ".cache", "crawl")
+embedding_cache_path = os.path.join(os.path.dirname(__file__), ".cache", "embeddings.sqlite3")
+
+
+# step 4 - the service, the client and the page are loaded on first use
+class WebRagService:
+    """Answers questions about one web page.
+       The page is fetched the first time it is needed, or by warmup(),
+       never at import time. Fetches go through the on-disk http cache, so an
+       unchanged page costs one 304 and reuses its parsed text and passages.
+       The page is indexed so a prompt carries only the passages that fit
+       context_token_budget; self.context_index.stats() compares those prompt
+       tokens with the whole page. Time spent per stage is recorded in
+       self.timings. Answers are cached per question and selected passages;
+       there is no embedding model here, so only exact (normalized) repeats of
+       a question hit
+    """
+
+    def __init__(self, url=url, base_url=base_url, model=model, context_token_budget=context_token_budget,
+                 http_cache_dir=http_cache_dir):
+        self.url = url
+        self.base_url = base_url
+        self.model = model
+        self.context_token_budget = context_token_budget
+        self.http_cache_dir = http_cache_dir
+        self.timings = {}
+        self._client = None
+        self._http_cache = None
+        self._page = None
+        self._website_context = None
+        self._website_context_id = None
+        self._context_index = None
+        self.answer_cache = AnswerCache()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with timed(self.timings, "create client"):
+                load_dotenv()
+                self._client = OpenAI(api_key="ollama", base_url=self.base_url)
+        return self._client
+
+    @property
+    def http_cache(self):
+        if self._http_cache is None:
+            self._http_cache = HttpCache(self.http_cache_dir)
+        return self._http_cache
+
+    def _parse_page(self, content):
+        soup = BeautifulSoup(content, "html.parser")
+        return soup.body.get_text(separator="\n", strip=True) if soup.body else "no info found"
+
+    @property
+    def website_context(self):
+        if self._website_context is None:
+            with timed(self.timings, "fetch page"):
+                self._page = self.http_cache.fetch(self.url)
+            with timed(self.timings, "parse page"):
+                self._website_context = self.http_cache.artifact(self._page, "text",
+                                                                 lambda: self._parse_page(self._page.content))
+                self._website_context_id = context_key(self._website_context)
+        return self._website_context
+
+    @property
+    def context_index(self):
+        if self._context_index is None:
+            website_context = self.website_context
+            with timed(self.timings, "index page"):
+                spans = self.http_cache.artifact(self._page, f"passages-{PASSAGE_TOKENS}-{PASSAGE_OVERLAP_TOKENS}",
+                                                 lambda: passage_spans(website_context))
+                self._context_index = ContextIndex(website_context, spans=spans)
+        return self._context_index
+
+    def warmup(self):
+        """Create the client and download the page now instead of on the first question"""
+        self.client
+        self.context_index
+        return self
+
+    def select_context(self, question):
+        """Return (context key, context text) for the question"""
+        chunk_ids, context = self.context_index.select(question, self.context_token_budget)
+        return context_key([self._website_context_id] + chunk_ids), context
+
+    def get_response(self, HumanMessage, history):
+        """Yield the answer as it is generated, the text so far on every token, for gr.ChatInterface"""
+        context_id, context = self.select_context(HumanMessage)
+        answer = self.answer_cache.get(HumanMessage, context_id)
+        if answer is not None:
+            yield answer
+            return
+        messages = f"Context from {self.url}:\n{context}\n\n Question: {HumanMessage}\n Answer only based on context"
+        answer = ""
+        for answer in stream_chat(self.client, self.model, [{"role":"user", "content":messages}], self.timings):
+            yield answer
+        self.answer_cache.put(HumanMessage, context_id, answer)
+
+
+class SiteRagService(WebRagService):
+    """Answers questions about a whole site, crawled from url.
+       The crawl streams every page into a FaissStore in site_store_dir; a
+       restart only re-embeds pages whose text changed and drops pages that
+       are gone. Questions get the best hybrid (BM25 + vector) matches that
+       fit context_token_budget
+    """
+
+    def __init__(self, url=url, base_url=base_url, model=model, context_token_budget=context_token_budget,
+                 http_cache_dir=http_cache_dir, max_pages=crawl_max_pages, max_depth=crawl_max_depth,
+                 embedding_model=embedding_model, store_dir=site_store_dir, pages_dir=site_pages_dir,
+                 cache_path=embedding_cache_path):
+        super().__init__(url, base_url, model, context_token_budget, http_cache_dir)
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.embedding_model = embedding_model
+        self.store_dir = store_dir
+        self.pages_dir = pages_dir
+        self.cache_path = cache_path
+        self._embedding_cache = None
+        self._store = None
+
+    def embed(self, texts):
+        if self._embedding_cache is None:
+            self._embedding_cache = EmbeddingCache(self.cache_path)
+        return embed_texts(self.client, texts, model=self.embedding_model, cache=self._embedding_cache)
+
+    @property
+    def store(self):
+        if self._store is None:
+            with timed(self.timings, "crawl site"):
+                store = FaissStore(self.store_dir)
+                pages = asyncio.run(crawl_to_store(self.url, store, self.embed, self.pages_dir,
+                                                   max_pages=self.max_pages, max_depth=self.max_depth))
+            print(f"Crawled {pages} pages, {len(store.live_ids())} chunks indexed")
+            self._store = store
+        return self._store
+
+    def warmup(self):
+        """Create the client and crawl the site now instead of on the first question"""
+        self.client
+        self.store
+        return self
+
+    def select_context(self, question):
+        results = self.store.search_hybrid([question], self.embed([question]), top_k=16)[0]
+        chunk_ids, passages, used = [], [], 0
+        for _, chunk_id, text in results:
+            tokens = count_regex_tokens(text)
+            if used + tokens > self.context_token_budget:
+                continue
+            chunk_ids.append(chunk_id)
+            passages.append(text)
+            used += tokens
+        return context_key(chunk_ids), "\n\n".join(passages)
+
+
+service = SiteRagService() if crawl_max_pages else WebRagService()
+get_response = service.get_response
+
+if __name__ == "__main__":
+    import gradio as gr
+
+    for answer in get_response("Who is the cto of here and now ai?", []):
+        pass
+    print(answer)
+    if not crawl_max_pages:
+        print(service.context_index.stats())
+    gr.ChatInterface(fn=get_response, title="RAG from web from HERE AND NOW AI").launch()
@@ -0,0 +1,16 @@
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def timed(timings, name):
+    """Add the wall time of the with block to timings[name], in seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def format_timings(timings):
+    return "\n".join(f"{name:28} {seconds * 1000:9.1f} ms" for name, seconds in timings.items())
@@ -1,4 +1,4 @@
-import gradio as gr
-from rag_from_pdf import get_response
-
+import gradio as gr
+from rag_from_pdf import get_response
+
 gr.ChatInterface(fn=get_response, title="RAG from PDF").launch()
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""Concurrent crawler that indexes a whole site for rag_from_web.
+
+crawl() is an async generator of parsed pages. Downloads share one aiohttp
+connection pool of `concurrency` connections with at most `per_host` open
+to any one host. A page is only fetched when
+    - it is on the same host as a start url (unless same_domain=False)
+    - it is at most max_depth links away from a start url
+    - robots.txt allows it for our user agent
+    - its canonical url, fragment dropped and query sorted, was not seen
+      before; <link rel="canonical"> is honoured after parsing as well
+HTML is parsed with lxml in a pool of spawned processes (page_parser.py)
+so parsing never blocks the downloads.
+
+crawl_to_store() streams the pages into a FaissStore: every page is
+written to a text file, chunked and embedded in batches while the crawl
+goes on, and pages that disappeared from the site are dropped at the end.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import urllib.robotparser
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from chunking import chunk_pages
+from page_parser import canonical_url, parse_html
+
+MAX_PAGES = 200
+MAX_DEPTH = 3
+CONCURRENCY = 16
+PER_HOST = 8
+TIMEOUT_SECONDS = 15
+BATCH_PAGES = 32
+USER_AGENT = "Mozilla/5.0 (compatible; metriqe-crawler)"
+# every parse worker is a spawned process that imports the main script once, a few are enough
+PARSE_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class CrawledPage:
+    def __init__(self, url, depth, title, text):
+        self.url = url
+        self.depth = depth
+        self.title = title
+        self.text = text
+
+
+class _Robots:
+    """robots.txt rules per host, fetched once per host"""
+
+    def __init__(self, session, user_agent):
+        self.session = session
+        self.user_agent = user_agent
+        self.parsers = {}
+
+    async def allowed(self, url):
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self.parsers:
+            self.parsers[origin] = asyncio.ensure_future(self._load(origin))
+        parser = await self.parsers[origin]
+        return parser.can_fetch(self.user_agent, url)
+
+    async def _load(self, origin):
+        parser = urllib.robotparser.RobotFileParser()
+        try:
+            async with self.session.get(origin + "/robots.txt") as response:
+                if response.status >= 400:
+                    # no robots.txt, or an error reading it, means everything is allowed
+                    parser.parse([])
+                else:
+                    parser.parse((await response.text(errors="replace")).splitlines())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            parser.parse([])
+        return parser
+
+
+async def crawl(start_urls, max_pages=MAX_PAGES, max_depth=MAX_DEPTH, concurrency=CONCURRENCY, per_host=PER_HOST,
+                same_domain=True, respect_robots=True, parse_workers=PARSE_WORKERS, user_agent=USER_AGENT,
+                timeout=TIMEOUT_SECONDS):
+    """Crawl breadth first from start_urls and yield a CrawledPage per HTML page, in completion order"""
+    if isinstance(start_urls, str):
+        start_urls = [start_urls]
+    start_urls = [canonical_url(url) for url in start_urls]
+    hosts = {urlsplit(url).netloc for url in start_urls}
+    seen = set(start_urls)
+    scheduled = len(start_urls)
+    frontier = asyncio.Queue()
+    pages = asyncio.Queue()
+    for url in start_urls[:max_pages]:
+        frontier.put_nowait((url, 0))
+
+    loop = asyncio.get_running_loop()
+    # spawned, not forked: forking while the event loop and aiohttp's resolver threads run can deadlock
+    executor = ProcessPoolExecutor(parse_workers, mp_context=multiprocessing.get_context("spawn"))
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+    session = aiohttp.ClientSession(connector=connector, headers={"User-Agent": user_agent},
+                                    timeout=aiohttp.ClientTimeout(total=timeout))
+    robots = _Robots(session, user_agent)
+
+    async def fetch(url):
+        try:
+            async with session.get(url) as response:
+                if response.status != 200 or "html" not in response.headers.get("Content-Type", ""):
+                    return None, url
+                return await response.read(), canonical_url(str(response.url))
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Could not fetch {url}: {e!r}")
+            return None, url
+
+    async def visit(url, depth):
+        nonlocal scheduled
+        # links are checked before they are scheduled, so they do not count against max_pages
+        if depth == 0 and respect_robots and not await robots.allowed(url):
+            return
+        content, final_url = await fetch(url)
+        if content is None:
+            return
+        title, text, links, canonical = await loop.run_in_executor(executor, parse_html, final_url, content)
+        # redirects and rel=canonical can point at a page that was already crawled
+        for alias in {final_url, canonical} - {url}:
+            if alias in seen:
+                return
+            seen.add(alias)
+        await pages.put(CrawledPage(canonical, depth, title, text))
+        if depth >= max_depth:
+            return
+        for link in links:
+            if scheduled >= max_pages:
+                break
+            if link in seen or (same_domain and urlsplit(link).netloc not in hosts):
+                continue
+            if respect_robots and not await robots.allowed(link):
+                seen.add(link)
+                continue
+            seen.add(link)
+            scheduled += 1
+            frontier.put_nowait((link, depth + 1))
+
+    async def worker():
+        while True:
+            url, depth = await frontier.get()
+            try:
+                await visit(url, depth)
+            except Exception as e:
+                # one bad page must not take a worker down, the crawl would never finish
+                print(f"Could not crawl {url}: {e!r}")
+            finally:
+                frontier.task_done()
+
+    async def finish():
+        await frontier.join()
+        await pages.put(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    finisher = asyncio.create_task(finish())
+    try:
+        while True:
+            page = await pages.get()
+            if page is None:
+                break
+            yield page
+    finally:
+        for task in workers + [finisher]:
+            task.cancel()
+        await asyncio.gather(*workers, finisher, return_exceptions=True)
+        await session.close()
+        executor.shutdown(cancel_futures=True)
+
+
+def page_path(pages_dir, url):
+    return os.path.join(pages_dir, hashlib.sha256(url.encode("utf-8")).hexdigest()[:32] + ".txt")
+
+
+def _write_page(pages_dir, page):
+    """Write the page text, unless unchanged, so the store sees an unchanged file and skips it"""
+    path = os.path.abspath(page_path(pages_dir, page.url))
+    data = f"Source: {page.url}\n{page.title}\n\n{page.text}".encode("utf-8")
+    try:
+        with open(path, "rb") as f:
+            if f.read() == data:
+                return path
+    except OSError:
+        pass
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def read_page_chunks(path, max_tokens, overlap_tokens):
+    with open(path, encoding="utf-8") as f:
+        return list(chunk_pages([f.read()], max_tokens, overlap_tokens))
+
+
+async def crawl_to_store(start_urls, store, embed, pages_dir, chunk_tokens=256, chunk_overlap_tokens=32,
+                         batch_pages=BATCH_PAGES, **crawl_options):
+    """Crawl start_urls and keep store in line with the pages found.
+       Pages are synced into the store batch_pages at a time in a background
+       thread while the crawl continues. Returns the number of pages crawled
+    """
+    os.makedirs(pages_dir, exist_ok=True)
+    loop = asyncio.get_running_loop()
+    crawled = []
+    pending = None
+
+    def read_chunks(path):
+        return read_page_chunks(path, chunk_tokens, chunk_overlap_tokens)
+
+    def sync(paths, final):
+        if not final:
+            # pages from an earlier crawl that were not reached yet must not be dropped mid crawl
+            crawled_set = set(paths)
+            paths += [path for path in store.manifest["sources"] if path not in crawled_set and os.path.exists(path)]
+        return store.sync(paths, read_chunks, embed)
+
+    async for page in crawl(start_urls, **crawl_options):
+        crawled.append(_write_page(pages_dir, page))
+        if len(crawled) % batch_pages == 0:
+            # one sync at a time, the next batch waits for the previous one
+            if pending is not None:
+                await pending
+            pending = loop.run_in_executor(None, sync, list(crawled), False)
+    if pending is not None:
+        await pending
+    await loop.run_in_executor(None, sync, crawled, True)
+    return len(crawled)